@@ -1,9 +1,18 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.exceptions import AuthenticationFailed
 
+from ..user_cache import get_cached_user
+
 class CookieJWTAuthentication(JWTAuthentication):
     """
     Custom Authentication class to read JWT from HttpOnly cookies.
+
+    The user of a token is resolved through the two-tier user cache (see
+    `get_cached_user`), so most authenticated requests do not query the
+    database.
     """
     def authenticate(self, request):
         # Try to get the access token from the cookie
@@ -22,4 +31,26 @@ class CookieJWTAuthentication(JWTAuthentication):
         except AuthenticationFailed:
             return None
 
-        return self.get_user(validated_token), validated_token
\ No newline at end of file
+        return self.get_user(validated_token), validated_token
+
+    def get_user(self, validated_token):
+        """
+        Returns the user of a validated token with the same checks as SimpleJWT, read from the cache.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != user.password_fingerprint:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
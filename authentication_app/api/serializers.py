@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from ..models import CustomUser
+from ..tokens import RefreshToken
 
 class RegistrationSerializer(serializers.ModelSerializer):
     """
@@ -74,4 +76,12 @@ class SetNewPasswordSerializer(serializers.Serializer):
         """
         if data['new_password'] != data['confirm_password']:
             raise serializers.ValidationError({"new_password": "Passwords must match."})
-        return data
\ No newline at end of file
+        return data
+
+
+class CookieTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Serializer for refreshing an access token.
+    Checks the refresh token against the Redis blacklist.
+    """
+    token_class = RefreshToken
@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import uuid
+
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework.throttling import SimpleRateThrottle
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Sliding-window rate limit for the password-hashing endpoints, kept in Redis.
+
+    Views opt in with `throttle_scope`; the budget of a scope is read from
+    DEFAULT_THROTTLE_RATES under `<scope>_<key_type>` (e.g. `login_ip`), and
+    scopes without a budget are not limited. Every identity owns one sorted
+    set of request timestamps: entries older than the window are dropped and
+    the request is admitted while fewer than the budget remain. Unlike DRF's
+    cache-based throttles, the check is one atomic Redis transaction, so
+    concurrent processes share the exact same window.
+
+    Throttles run before the view, so rejected requests never reach password
+    hashing or the database. Admitted and rejected requests are counted in
+    `videoflix_throttle_requests_total`. If Redis is unavailable, requests
+    are admitted.
+    """
+    key_type = None
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        # The rate depends on the view's scope, which is only known in `allow_request`.
+        pass
+
+    def allow_request(self, request, view):
+        view_scope = getattr(view, 'throttle_scope', None)
+        if not view_scope:
+            return True
+
+        self.scope = f'{view_scope}_{self.key_type}'
+        self.rate = self.THROTTLE_RATES.get(self.scope)
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        ident = self.get_ident_value(request, view)
+        if not ident:
+            return True
+        key = self.cache_format % {'scope': self.scope, 'ident': ident}
+
+        self.now = self.timer()
+        member = f'{self.now}:{uuid.uuid4().hex}'
+        try:
+            redis = get_redis_connection('default')
+            pipeline = redis.pipeline()
+            pipeline.zremrangebyscore(key, '-inf', self.now - self.duration)
+            pipeline.zadd(key, {member: self.now})
+            pipeline.zcard(key)
+            pipeline.zrange(key, 0, 0, withscores=True)
+            pipeline.expire(key, self.duration)
+            _, _, count, oldest, _ = pipeline.execute()
+
+            allowed = count <= self.num_requests
+            if not allowed:
+                # Rejected requests do not use up the budget.
+                redis.zrem(key, member)
+        except RedisError:
+            logger.warning("Throttle %s skipped, Redis is unavailable", self.scope, exc_info=True)
+            return True
+
+        self.oldest = oldest[0][1] if oldest else self.now
+        metrics.inc(
+            'videoflix_throttle_requests_total',
+            scope=view_scope, key=self.key_type, result='allowed' if allowed else 'rejected'
+        )
+        return allowed
+
+    def wait(self):
+        return max(self.oldest + self.duration - self.now, 0)
+
+    def get_ident_value(self, request, view):
+        """
+        Returns the identity the budget is counted for, or None to skip the request.
+        """
+        raise NotImplementedError('.get_ident_value() must be overridden')
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    """
+    Sliding-window throttle per client IP (respecting NUM_PROXIES).
+    """
+    key_type = 'ip'
+
+    def get_ident_value(self, request, view):
+        return self.get_ident(request)
+
+
+class EmailRateThrottle(SlidingWindowThrottle):
+    """
+    Sliding-window throttle per target account, so distributed attacks on one account are limited too.
+
+    The account is identified by the submitted email address or, for links
+    sent by email, by the `uidb64` URL argument. The value is hashed, so no
+    addresses are stored in Redis.
+    """
+    key_type = 'email'
+
+    def get_ident_value(self, request, view):
+        value = view.kwargs.get('uidb64')
+        if value is None:
+            email = request.data.get('email') if hasattr(request.data, 'get') else None
+            value = email.strip().lower() if isinstance(email, str) else None
+        if not value:
+            return None
+        return hashlib.sha256(value.encode()).hexdigest()
@@ -1,5 +1,3 @@
-import django_rq
-
 from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.tokens import default_token_generator
@@ -9,22 +7,28 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from rest_framework import generics, permissions, status, views
 from rest_framework.response import Response
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView
 
-from .serializers import LoginSerializer, PasswordResetSerializer, RegistrationSerializer, SetNewPasswordSerializer
+from .serializers import (
+    CookieTokenRefreshSerializer, LoginSerializer, PasswordResetSerializer, RegistrationSerializer,
+    SetNewPasswordSerializer,
+)
+from .throttling import EmailRateThrottle, IPRateThrottle
 from .utils import account_activation_token
 from ..models import CustomUser
 from ..tasks import send_activation_email, send_password_reset_email
+from ..tokens import RefreshToken
 
 
 class RegisterView(generics.CreateAPIView):
     """
     API endpoint for user registration.
     
-    Creates a new user, generates an activation token, and enqueues an email task.
+    Creates a new user, generates an activation token, and queues the activation email.
     """
     serializer_class = RegistrationSerializer
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = 'register'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -37,8 +41,7 @@ class RegisterView(generics.CreateAPIView):
         frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5500')
         activation_link = f"{frontend_url}/pages/auth/activate.html?uid={uid}&token={token}"
 
-        queue = django_rq.get_queue('default', autocommit=True)
-        queue.enqueue(send_activation_email, user.email, activation_link)
+        send_activation_email(user.email, activation_link)
 
         response_data = {
             "user": {
@@ -76,6 +79,8 @@ class LoginView(generics.GenericAPIView):
     Returns JWT tokens in HttpOnly cookies and user info in body.
     """
     serializer_class = LoginSerializer
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = 'login'
 
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -122,7 +127,8 @@ class LogoutView(views.APIView):
     """
     API endpoint for user logout.
     
-    It attempts to blacklist the refresh token and always removes the authentication cookies.
+    It attempts to blacklist the refresh token (in Redis, until the token expires)
+    and always removes the authentication cookies.
     """
     permission_classes = [permissions.IsAuthenticated]
 
@@ -150,7 +156,10 @@ class LogoutView(views.APIView):
 class CookieTokenRefreshView(TokenRefreshView):
     """
     API endpoint to refresh the access token using the refresh token from the cookie.
+    Blacklisted (logged out) refresh tokens are rejected via the Redis blacklist.
     """
+    serializer_class = CookieTokenRefreshSerializer
+
     def post(self, request, *args, **kwargs):
         refresh_token = request.COOKIES.get('refresh_token')
         
@@ -190,6 +199,8 @@ class PasswordResetView(generics.GenericAPIView):
     If the email exists, a reset link containing a token is sent to the user.
     """
     serializer_class = PasswordResetSerializer
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = 'password_reset'
     permission_classes = [] 
 
     def post(self, request):
@@ -205,8 +216,7 @@ class PasswordResetView(generics.GenericAPIView):
             frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5500')
             reset_link = f"{frontend_url}/pages/auth/confirm_password.html?uid={uid}&token={token}"
 
-            queue = django_rq.get_queue('default', autocommit=True)
-            queue.enqueue(send_password_reset_email, user.email, reset_link)
+            send_password_reset_email(user.email, reset_link)
             
         except CustomUser.DoesNotExist:
             pass
@@ -222,6 +232,8 @@ class PasswordResetConfirmView(generics.GenericAPIView):
     If valid, sets the new password for the user.
     """
     serializer_class = SetNewPasswordSerializer
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = 'password_reset_confirm'
     permission_classes = [] 
 
     def post(self, request, uidb64, token):
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class AuthenticationAppConfig(AppConfig):
     name = 'authentication_app'
+
+    def ready(self):
+        """
+        Import signals when the app is ready.
+        """
+        import authentication_app.signals
@@ -0,0 +1,93 @@
+"""
+Outbox for transactional emails.
+
+Requests only append a small JSON message to a Redis list and make sure one
+`dispatch_emails` job is pending. The job drains the outbox in batches of
+EMAIL_BATCH_SIZE, renders every message with templates compiled once per
+batch and sends the whole batch over one SMTP connection.
+"""
+import json
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
+from django.utils.html import strip_tags
+from django_redis import get_redis_connection
+import django_rq
+from rq import Retry
+
+OUTBOX_KEY = 'mail:outbox'
+SCHEDULED_KEY = 'mail:dispatch-scheduled'
+
+# Seconds until a pending dispatch flag expires, in case its job was lost.
+SCHEDULED_TIMEOUT = 15 * 60
+
+# Back-off between attempts of a failed dispatch job (needs a worker started with --with-scheduler).
+RETRY_INTERVALS = [10, 30, 60, 300, 900]
+
+
+def queue_email(recipient, subject, template_name, context):
+    """
+    Adds an HTML email to the outbox and schedules its dispatch.
+
+    The template is rendered by the worker; `context` must be JSON-serializable.
+    """
+    message = {
+        'to': recipient,
+        'subject': subject,
+        'template': template_name,
+        'context': context,
+        'attempts': 0,
+    }
+    redis = get_redis_connection('default')
+    redis.rpush(OUTBOX_KEY, json.dumps(message))
+    schedule_dispatch(redis)
+
+
+def schedule_dispatch(redis=None):
+    """
+    Enqueues a `dispatch_emails` job unless one is already pending.
+    """
+    from .tasks import dispatch_emails
+
+    redis = redis or get_redis_connection('default')
+    if redis.set(SCHEDULED_KEY, 1, nx=True, ex=SCHEDULED_TIMEOUT):
+        queue = django_rq.get_queue('default', autocommit=True)
+        queue.enqueue(dispatch_emails, retry=Retry(max=len(RETRY_INTERVALS), interval=RETRY_INTERVALS))
+
+
+def take_batch(redis, size):
+    """
+    Removes up to `size` messages from the head of the outbox and returns them decoded.
+    """
+    return [json.loads(raw) for raw in redis.lpop(OUTBOX_KEY, size) or []]
+
+
+def requeue(redis, messages):
+    """
+    Puts unsent messages back at the head of the outbox, keeping their order.
+    """
+    if messages:
+        redis.lpush(OUTBOX_KEY, *[json.dumps(message) for message in reversed(messages)])
+
+
+def build_message(message, connection):
+    """
+    Renders an outbox message into an email with an HTML and a plain-text part.
+    """
+    html = _template(message['template']).render(message['context'])
+    email = EmailMultiAlternatives(
+        message['subject'], strip_tags(html), settings.DEFAULT_FROM_EMAIL, [message['to']],
+        connection=connection,
+    )
+    email.attach_alternative(html, 'text/html')
+    return email
+
+
+@lru_cache(maxsize=None)
+def _template(name):
+    """
+    Internal helper returning a compiled template, loaded once per process.
+    """
+    return get_template(name)
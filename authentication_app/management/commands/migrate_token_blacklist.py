@@ -0,0 +1,41 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from authentication_app.tasks import prune_expired_tokens
+from authentication_app.tokens import blacklist_jti
+
+
+class Command(BaseCommand):
+    """
+    Copies the unexpired entries of SimpleJWT's blacklist tables into the Redis blacklist.
+
+    Run it once when deploying the Redis blacklist: tokens revoked before
+    the switch stay revoked until they expire. Expired rows can be pruned in
+    the same run; afterwards the daily `prune_expired_tokens` job drains the
+    tables, and `rest_framework_simplejwt.token_blacklist` can be removed
+    from INSTALLED_APPS once they are empty.
+
+    Example usage:
+    python manage.py migrate_token_blacklist --prune
+    """
+    help = "Copies revoked refresh tokens from the database blacklist into Redis"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true', help='Delete expired token rows afterwards')
+
+    def handle(self, *args, **options):
+        if not apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+            raise CommandError("rest_framework_simplejwt.token_blacklist is not installed.")
+
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        revoked = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).select_related('token')
+        copied = 0
+        for entry in revoked.iterator():
+            blacklist_jti(entry.token.jti, entry.token.expires_at.timestamp())
+            copied += 1
+        self.stdout.write(f"Copied {copied} revoked tokens to Redis")
+
+        if options['prune']:
+            self.stdout.write(f"Pruned {prune_expired_tokens()} expired token rows")
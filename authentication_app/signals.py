@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .user_cache import invalidate_user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    """
+    Signal receiver that drops a saved or deleted user from the authentication cache.
+
+    Activation, deactivation and password changes all save the user, so the
+    next request resolves the current row. The entry is dropped again after
+    the commit, in case a concurrent request cached the old row meanwhile.
+    `QuerySet.update()` sends no signal; callers must use `invalidate_user`.
+    """
+    invalidate_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
@@ -1,63 +1,124 @@
+import logging
+from smtplib import SMTPException, SMTPRecipientsRefused
+
+from django.apps import apps
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from django.core.mail import get_connection
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .mail import SCHEDULED_KEY, SCHEDULED_TIMEOUT, build_message, queue_email, requeue, take_batch
+
+logger = logging.getLogger(__name__)
 
 
 def send_activation_email(email, activation_url):
     """
-    Sends an account activation email to the user asynchronously.
+    Queues an account activation email for the outbox dispatcher.
 
     Args:
         email (str): The recipient's email address.
         activation_url (str): The complete URL for account activation.
     """
-    subject = "Activate your Videoflix Account"
-    
-
-    html_message = render_to_string('authentication_app/activation_email.html', {
+    queue_email(email, "Activate your Videoflix Account", 'authentication_app/activation_email.html', {
         'activation_url': activation_url,
         'app_name': "Videoflix"
     })
-    
-
-    plain_message = strip_tags(html_message)
-    from_email = settings.DEFAULT_FROM_EMAIL
 
-    send_mail(
-        subject,
-        plain_message,
-        from_email,
-        [email],
-        html_message=html_message,
-        fail_silently=False,
-    )
 
 def send_password_reset_email(email, reset_url):
     """
-    Sends a password reset email to the user asynchronously.
+    Queues a password reset email for the outbox dispatcher.
 
     Args:
         email (str): The recipient's email address.
         reset_url (str): The complete URL for password reset.
     """
-    subject = "Reset your Videoflix Password"
-    
-
-    html_message = render_to_string('authentication_app/password_reset_email.html', {
+    queue_email(email, "Reset your Videoflix Password", 'authentication_app/password_reset_email.html', {
         'reset_url': reset_url,
         'app_name': "Videoflix"
     })
-    
-
-    plain_message = strip_tags(html_message)
-    from_email = settings.DEFAULT_FROM_EMAIL
-
-    send_mail(
-        subject,
-        plain_message,
-        from_email,
-        [email],
-        html_message=html_message,
-        fail_silently=False,
-    )
\ No newline at end of file
+
+
+def dispatch_emails():
+    """
+    Drains the email outbox in batches over one reused SMTP connection.
+
+    The first batch is taken before connecting, so an empty outbox costs no
+    SMTP connection. The connection is then opened once for the whole run;
+    each message is handed to `send_messages` on that open connection, so a
+    failure is attributed to exactly one message. Messages that cannot be
+    rendered and refused recipients are dropped. On an SMTP or network error
+    the unsent messages go back to the head of the outbox and the job fails,
+    so RQ retries it with back-off (see `mail.RETRY_INTERVALS`); a message is
+    dropped after EMAIL_MAX_ATTEMPTS failed attempts. Any other error also
+    puts the unsent messages back before it is raised.
+    """
+    redis = get_redis_connection('default')
+    # Cleared first, so messages queued while this job runs schedule a new one.
+    redis.delete(SCHEDULED_KEY)
+
+    batch = take_batch(redis, settings.EMAIL_BATCH_SIZE)
+    if not batch:
+        return 0
+
+    sent = 0
+    index = 0
+    connection = get_connection()
+    try:
+        connection.open()
+        while batch:
+            for index, message in enumerate(batch):
+                try:
+                    email = build_message(message, connection)
+                except Exception:
+                    logger.exception("Dropped email '%s' to %s: it could not be rendered",
+                                     message.get('subject'), message.get('to'))
+                    continue
+                try:
+                    connection.send_messages([email])
+                except SMTPRecipientsRefused:
+                    logger.error("Dropped email '%s': recipient %s was refused", message['subject'], message['to'])
+                    continue
+                except (SMTPException, OSError):
+                    message['attempts'] += 1
+                    if message['attempts'] >= settings.EMAIL_MAX_ATTEMPTS:
+                        logger.exception("Dropped email '%s' to %s after %d attempts",
+                                         message['subject'], message['to'], message['attempts'])
+                        index += 1
+                    raise
+                sent += 1
+            batch, index = [], 0
+            batch = take_batch(redis, settings.EMAIL_BATCH_SIZE)
+    except (SMTPException, OSError):
+        requeue(redis, batch[index:])
+        # Hold back new dispatch jobs until RQ retries this one.
+        redis.set(SCHEDULED_KEY, 1, ex=SCHEDULED_TIMEOUT)
+        raise
+    except BaseException:
+        requeue(redis, batch[index:])
+        raise
+    finally:
+        connection.close()
+
+    logger.info("Dispatched %d emails", sent)
+    return sent
+
+
+def prune_expired_tokens():
+    """
+    Deletes expired rows of SimpleJWT's outstanding token table.
+
+    Revoked tokens are kept in Redis now (see `tokens.RefreshToken`), so the
+    tables are no longer written and only shrink; deleting an outstanding
+    token also deletes its blacklist entry. Scheduled daily in `core/cron.py`.
+    Returns the number of deleted rows.
+    """
+    if not apps.is_installed('rest_framework_simplejwt.token_blacklist'):
+        return 0
+
+    from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+    deleted, _ = OutstandingToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    logger.info("Pruned %d expired token rows", deleted)
+    return deleted
@@ -0,0 +1,63 @@
+import time
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+
+def blacklist_cache_key(jti):
+    """
+    Returns the Redis cache key marking a token id as revoked.
+    """
+    return f'auth:blacklist:{jti}'
+
+
+def blacklist_jti(jti, exp):
+    """
+    Revokes a token id until its expiry (a Unix timestamp).
+
+    The key expires together with the token, so the blacklist never holds
+    entries for tokens that would be rejected as expired anyway.
+    """
+    timeout = int(exp - time.time())
+    if timeout > 0:
+        cache.set(blacklist_cache_key(jti), 1, timeout)
+
+
+def is_blacklisted(jti):
+    """
+    Checks whether a token id has been revoked.
+    """
+    return cache.has_key(blacklist_cache_key(jti))
+
+
+class RefreshToken(tokens.RefreshToken):
+    """
+    Refresh token whose blacklist lives in Redis instead of the SimpleJWT tables.
+
+    Logging in no longer inserts an OutstandingToken row, blacklisting sets
+    one key with the token's remaining lifetime and every check is a single
+    key lookup. The database blacklist of SimpleJWT's BlacklistMixin is
+    skipped explicitly, so this works whether or not `token_blacklist` is
+    still installed (see `migrate_token_blacklist`).
+    """
+    def verify(self, *args, **kwargs):
+        self.check_blacklist()
+        super(tokens.BlacklistMixin, self).verify(*args, **kwargs)
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklist_jti(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+
+    def outstand(self):
+        # Outstanding tokens are not tracked; only revocations are stored.
+        return None
+
+    @classmethod
+    def for_user(cls, user):
+        return super(tokens.BlacklistMixin, cls).for_user(user)
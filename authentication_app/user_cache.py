@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from core import metrics
+
+# User fields kept in the cache. All others, the password hash in particular,
+# are deferred and only loaded from the database if accessed.
+CACHED_FIELDS = ('id', 'email', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+# Users kept in the process-local tier; the least recently used are evicted beyond it.
+LOCAL_MAX_ENTRIES = 1000
+
+# Process-local tier: cache key -> (monotonic expiry, cached entry), least recently used first.
+_local = OrderedDict()
+_lock = threading.Lock()
+
+
+def user_cache_key(user_id):
+    """
+    Returns the Redis cache key of a user.
+
+    Entries used to be pickled user instances under `auth:user:<id>`; the
+    new name keeps processes from reading those.
+    """
+    return f'auth:user-fields:{user_id}'
+
+
+def get_cached_user(user_id):
+    """
+    Returns the user with the given primary key, or None if it does not exist.
+
+    Users are looked up in process memory first (AUTH_USER_CACHE_LOCAL_TTL
+    seconds), then in Redis (AUTH_USER_CACHE_TIMEOUT seconds) and only then
+    in the database. Saves and deletes clear the Redis entry and the local
+    entry of the saving process; other processes may keep a local copy for
+    at most the local TTL. Expired local entries are dropped when they are
+    looked up, and at most LOCAL_MAX_ENTRIES users are kept per process.
+
+    Only CACHED_FIELDS and the `password_fingerprint` SimpleJWT's revoke
+    claim is checked against (the MD5 of the password hash, which every
+    token carries anyway) are cached, never the password hash itself. Every
+    call builds a new instance with the other fields deferred, so requests
+    never share a mutable user.
+    """
+    key = user_cache_key(user_id)
+    now = time.monotonic()
+
+    with _lock:
+        entry = _local.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _local.move_to_end(key)
+            else:
+                del _local[key]
+                entry = None
+    if entry is not None:
+        metrics.record_cache('user_local', True)
+        return _build_user(entry[1])
+    metrics.record_cache('user_local', False)
+
+    cached = cache.get(key)
+    metrics.record_cache('user', cached is not None)
+
+    if cached is None:
+        try:
+            user = get_user_model().objects.get(pk=user_id)
+        except (get_user_model().DoesNotExist, ValueError):
+            return None
+        cached = {
+            'fields': {field: getattr(user, field) for field in CACHED_FIELDS},
+            'password_fingerprint': get_md5_hash_password(user.password),
+        }
+        cache.set(key, cached, settings.AUTH_USER_CACHE_TIMEOUT)
+
+    with _lock:
+        _local[key] = (now + settings.AUTH_USER_CACHE_LOCAL_TTL, cached)
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+    return _build_user(cached)
+
+
+def invalidate_user(user_id):
+    """
+    Drops a user from the Redis tier and from this process' local tier.
+
+    Signals clear the cache on `save()` and `delete()` only. Code changing
+    users with `QuerySet.update()` (e.g. bulk deactivation) must call this
+    for every affected user, or they stay authenticated with their old state
+    for up to AUTH_USER_CACHE_TIMEOUT seconds.
+    """
+    key = user_cache_key(user_id)
+    with _lock:
+        _local.pop(key, None)
+    cache.delete(key)
+
+
+def _build_user(cached):
+    """
+    Internal helper creating a user instance from a cache entry, with all uncached fields deferred.
+    """
+    model = get_user_model()
+    # from_db expects the values in the order of the model's fields.
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in cached['fields']]
+    user = model.from_db(router.db_for_read(model), names, [cached['fields'][name] for name in names])
+    user.password_fingerprint = cached['password_fingerprint']
+    return user
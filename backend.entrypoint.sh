@@ -37,8 +37,15 @@ else:
     print(f"Superuser '{username}' already exists.")
 EOF
 
+python manage.py rqworker default --with-scheduler &
 python manage.py rqworker default &
 python manage.py rqworker default &
-python manage.py rqworker default &
+python manage.py rqcron core.cron &
+
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    exec uvicorn core.asgi:application --host 0.0.0.0 --port 8000 \
+        --workers "${WEB_CONCURRENCY:-$(nproc)}" --timeout-keep-alive 30
+fi
 
-exec gunicorn core.wsgi:application --bind 0.0.0.0:8000 --reload
\ No newline at end of file
+exec gunicorn core.wsgi:application --bind 0.0.0.0:8000 --reload \
+    --workers "${WEB_CONCURRENCY:-$((2 * $(nproc) + 1))}" --threads "${GUNICORN_THREADS:-4}"
\ No newline at end of file
@@ -0,0 +1,17 @@
+"""
+Periodic jobs, enqueued by the RQ cron scheduler:
+
+    python manage.py rqcron core.cron
+"""
+from django.conf import settings
+from rq import cron
+
+from authentication_app.tasks import dispatch_emails, prune_expired_tokens
+from video_app.tasks import flush_watch_progress, prewarm_hot_videos, rollup_view_stats
+
+cron.register(prune_expired_tokens, 'default', cron='30 3 * * *')
+# Picks up outbox messages whose dispatch job was lost or gave up retrying.
+cron.register(dispatch_emails, 'default', interval=5 * 60)
+cron.register(flush_watch_progress, 'default', interval=settings.WATCH_PROGRESS_FLUSH_INTERVAL)
+cron.register(rollup_view_stats, 'default', interval=settings.ANALYTICS_ROLLUP_INTERVAL)
+cron.register(prewarm_hot_videos, 'default', interval=settings.ANALYTICS_ROLLUP_INTERVAL)
@@ -0,0 +1,292 @@
+"""
+Prometheus metrics shared by the web processes and the RQ workers.
+
+gunicorn workers and RQ work horses are separate processes, so samples are
+first aggregated in a per-process buffer and added to one Redis hash (with
+HINCRBYFLOAT in a single pipeline) at most every METRICS_FLUSH_INTERVAL
+seconds. `/metrics` renders the stored totals plus live RQ queue gauges in
+the Prometheus text exposition format.
+"""
+import asyncio
+import atexit
+import hmac
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+import django_rq
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rq import Worker
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY = 'videoflix:metrics'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'videoflix_http_request_duration_seconds': (
+        'histogram', 'Time until the response of a view is returned (excludes streaming the body).', LATENCY_BUCKETS
+    ),
+    'videoflix_served_bytes_total': ('counter', 'Bytes of HLS segments served per rendition.', None),
+    'videoflix_cache_requests_total': ('counter', 'Cache lookups per cache and result (hit/miss).', None),
+    'videoflix_cache_evictions_total': ('counter', 'Entries evicted from the in-process hot cache per cache.', None),
+    'videoflix_throttle_requests_total': (
+        'counter', 'Requests checked by the auth throttles per scope, key (ip/email) and result (allowed/rejected).', None
+    ),
+    'videoflix_rq_job_duration_seconds': ('histogram', 'Run time of RQ jobs per task and outcome.', DURATION_BUCKETS),
+    'videoflix_ffmpeg_wall_seconds': ('histogram', 'Wall-clock time of ffmpeg runs.', DURATION_BUCKETS),
+    'videoflix_ffmpeg_cpu_seconds': (
+        'histogram', 'CPU time (user + system) of ffmpeg runs, from the process rusage.', DURATION_BUCKETS
+    ),
+}
+
+_buffer = defaultdict(float)
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def inc(name, value=1, **labels):
+    """
+    Adds `value` to a counter.
+    """
+    _add({f'{name}{_format_labels(labels)}': value})
+
+
+def observe(name, value, **labels):
+    """
+    Records one observation of a histogram.
+    """
+    _, _, buckets = METRICS[name]
+    samples = {
+        f'{name}_bucket{_format_labels({**labels, "le": _format_bound(bound)})}': 1
+        for bound in buckets if value <= bound
+    }
+    samples[f'{name}_bucket{_format_labels({**labels, "le": "+Inf"})}'] = 1
+    samples[f'{name}_sum{_format_labels(labels)}'] = value
+    samples[f'{name}_count{_format_labels(labels)}'] = 1
+    _add(samples)
+
+
+def record_cache(cache_name, hit):
+    """
+    Counts one lookup of a named cache as a hit or a miss.
+    """
+    inc('videoflix_cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+
+def flush():
+    """
+    Adds the buffered samples of this process to Redis.
+
+    Samples are dropped (and a warning logged) if Redis is unavailable, so
+    metrics never block or fail the request or job that produced them.
+    """
+    global _last_flush
+
+    with _lock:
+        samples = dict(_buffer)
+        _buffer.clear()
+        _last_flush = time.monotonic()
+
+    if not samples:
+        return
+
+    try:
+        pipeline = get_redis_connection('default').pipeline(transaction=False)
+        for sample, value in samples.items():
+            pipeline.hincrbyfloat(REDIS_KEY, sample, value)
+        pipeline.execute()
+    except RedisError:
+        logger.warning("Dropped %d metric samples, Redis is unavailable", len(samples), exc_info=True)
+
+
+def render():
+    """
+    Returns all metrics in the Prometheus text exposition format.
+    """
+    flush()
+    stored = {
+        field.decode(): float(value)
+        for field, value in get_redis_connection('default').hgetall(REDIS_KEY).items()
+    }
+
+    lines = []
+    for name, (kind, help_text, _) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        lines += [
+            f'{sample} {_format_value(stored[sample])}' for sample in sorted(stored, key=_sort_key)
+            if sample.partition('{')[0] in (name, f'{name}_bucket', f'{name}_sum', f'{name}_count')
+        ]
+
+    lines += _queue_metrics()
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Serves the metrics to INTERNAL_IPS and to requests with `Authorization: Bearer <METRICS_TOKEN>`.
+
+    Behind a reverse proxy (NUM_PROXIES set) every request arrives from the
+    proxy's address, so INTERNAL_IPS is not trusted there and only the token
+    grants access; without a token /metrics then stays closed.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    authorized = bool(token) and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+    internal = (
+        not settings.REST_FRAMEWORK.get('NUM_PROXIES')
+        and request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+    )
+
+    if not authorized and not internal:
+        return HttpResponseForbidden()
+
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MetricsMiddleware:
+    """
+    Records the latency of every request per view name, method and status code.
+
+    The middleware runs natively under WSGI and ASGI, so it adds no thread
+    switch in front of the async streaming views. Under ASGI the sample is
+    recorded in a thread, since it may flush the buffer to Redis.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        await asyncio.to_thread(self._record, request, response, start)
+        return response
+
+    def _record(self, request, response, start):
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else 'unmatched'
+        observe(
+            'videoflix_http_request_duration_seconds', time.perf_counter() - start,
+            view=view, method=request.method, status=str(response.status_code)
+        )
+
+
+class MetricsWorker(Worker):
+    """
+    RQ worker that records the duration and outcome of every job.
+
+    Jobs run in a forked work horse that exits without running atexit
+    handlers, so the buffer is flushed after each job.
+    """
+    def perform_job(self, job, queue):
+        start = time.monotonic()
+        succeeded = False
+        try:
+            succeeded = super().perform_job(job, queue)
+            return succeeded
+        finally:
+            observe(
+                'videoflix_rq_job_duration_seconds', time.monotonic() - start,
+                task=job.func_name, queue=queue.name, status='finished' if succeeded else 'failed'
+            )
+            flush()
+
+
+def _add(samples):
+    """
+    Internal helper that buffers samples and flushes them once the interval has passed.
+    """
+    with _lock:
+        for sample, value in samples.items():
+            _buffer[sample] += value
+        due = time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL
+
+    if due:
+        flush()
+
+
+def _queue_metrics():
+    """
+    Internal helper returning live gauges of the configured RQ queues and their workers.
+    """
+    lines = [
+        '# HELP videoflix_rq_queue_jobs Jobs per RQ queue and state.',
+        '# TYPE videoflix_rq_queue_jobs gauge',
+    ]
+    workers = [
+        '# HELP videoflix_rq_workers Workers listening on each RQ queue.',
+        '# TYPE videoflix_rq_workers gauge',
+    ]
+    for name in settings.RQ_QUEUES:
+        queue = django_rq.get_queue(name)
+        try:
+            counts = {
+                'queued': queue.count,
+                'started': queue.started_job_registry.count,
+                'deferred': queue.deferred_job_registry.count,
+                'scheduled': queue.scheduled_job_registry.count,
+                'failed': queue.failed_job_registry.count,
+            }
+            worker_count = Worker.count(queue=queue)
+        except RedisError:
+            logger.warning("Could not read the state of RQ queue %s", name, exc_info=True)
+            continue
+
+        lines += [
+            f'videoflix_rq_queue_jobs{_format_labels({"queue": name, "state": state})} {count}'
+            for state, count in counts.items()
+        ]
+        workers.append(f'videoflix_rq_workers{_format_labels({"queue": name})} {worker_count}')
+    return lines + workers
+
+
+def _sort_key(sample):
+    """
+    Internal helper ordering samples by label set, then buckets by ascending bound, then _sum and _count.
+    """
+    name, _, labels = sample.partition('{')
+    labels, _, bound = labels.rstrip('}').partition('le="')
+    suffix = name.rsplit('_', 1)[-1]
+    order = {'bucket': 0, 'sum': 1, 'count': 2}.get(suffix, 0)
+    return labels.rstrip(','), order, float(bound.rstrip('"')) if bound else 0.0
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return str(float(bound))
+
+
+def _format_value(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+atexit.register(flush)
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',             
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -97,6 +98,127 @@ RQ_QUEUES = {
     },
 }
 
+RQ = {
+    # Records the duration of every job for /metrics.
+    'WORKER_CLASS': 'core.metrics.MetricsWorker',
+}
+
+# --- Metrics & Logging ---
+# /metrics serves Prometheus metrics to INTERNAL_IPS and to scrapers sending
+# `Authorization: Bearer <METRICS_TOKEN>`. Behind a reverse proxy (NUM_PROXIES
+# set) all requests come from the proxy, so only the token is accepted there.
+# Every process buffers its samples and adds them to Redis at most every
+# METRICS_FLUSH_INTERVAL seconds.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'default': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'default'},
+    },
+    'root': {'handlers': ['console'], 'level': os.getenv('LOG_LEVEL', 'INFO')},
+}
+
+# --- Video Processing ---
+# 'ladder' decodes the source once and writes all renditions in one ffmpeg run,
+# 'per_rendition' enqueues one independent ffmpeg job per rendition,
+# 'chunked' splits the source at keyframes into VIDEO_CHUNK_SECONDS pieces that
+# any worker (on any node sharing MEDIA_ROOT) encodes, then stitches the results.
+VIDEO_TRANSCODE_MODE = os.getenv('VIDEO_TRANSCODE_MODE', 'ladder')
+VIDEO_HLS_TIME = int(os.getenv('VIDEO_HLS_TIME', 10))
+VIDEO_CHUNK_SECONDS = int(os.getenv('VIDEO_CHUNK_SECONDS', 60))
+
+# libx264 settings of every re-encoded rendition; compare alternatives with
+# `python manage.py benchmark_transcode`.
+VIDEO_X264_PRESET = os.getenv('VIDEO_X264_PRESET', 'medium')
+VIDEO_X264_CRF = int(os.getenv('VIDEO_X264_CRF', 23))
+
+# HLS outputs are stored below MEDIA_ROOT/<VIDEO_HLS_DIR>/<shard>/<video id>/<rendition>/.
+VIDEO_HLS_DIR = os.getenv('VIDEO_HLS_DIR', 'hls')
+
+# Transcodes block their RQ job until ffmpeg exits. At most VIDEO_TRANSCODE_CONCURRENCY
+# encodes run at once per node (0 = number of available cores).
+VIDEO_TRANSCODE_CONCURRENCY = int(os.getenv('VIDEO_TRANSCODE_CONCURRENCY', 0))
+VIDEO_TRANSCODE_THREADS = int(os.getenv('VIDEO_TRANSCODE_THREADS', 0))
+VIDEO_TRANSCODE_TIMEOUT = int(os.getenv('VIDEO_TRANSCODE_TIMEOUT', 6 * 60 * 60))
+VIDEO_TRANSCODE_LOCK_DIR = os.getenv('VIDEO_TRANSCODE_LOCK_DIR', '/tmp/videoflix-transcode')
+
+# How playlists and segments are delivered once a request is authorized:
+# 'sendfile' (zero-copy via the WSGI server), 'python', 'x-accel-redirect' (nginx) or 'x-sendfile'.
+VIDEO_DELIVERY_MODE = os.getenv('VIDEO_DELIVERY_MODE', 'sendfile')
+VIDEO_ACCEL_REDIRECT_PREFIX = os.getenv('VIDEO_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# Per-process byte budget of the hot cache for segments (memory-mapped, shared
+# through the page cache) and finished playlists; 0 disables it. It serves the
+# 'python' delivery mode and the async views.
+VIDEO_HOT_CACHE_BYTES = int(os.getenv('VIDEO_HOT_CACHE_BYTES', 0))
+
+# 'wsgi' runs gunicorn; 'asgi' runs uvicorn and routes playlists and segments to
+# async views, so slow clients do not tie up a worker while a segment is sent.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+# Playlists hand out HMAC-signed segment URLs, each valid for VIDEO_SIGNED_URL_TTL
+# seconds after its position in the video. Segment requests without a valid
+# signature fall back to the cookie JWT authentication.
+VIDEO_SIGNED_URLS = os.getenv('VIDEO_SIGNED_URLS', 'True').lower() == 'true'
+VIDEO_SIGNED_URL_TTL = int(os.getenv('VIDEO_SIGNED_URL_TTL', 15 * 60))
+VIDEO_SIGNING_KEY = os.getenv('VIDEO_SIGNING_KEY', SECRET_KEY)
+
+# Seconds a variant playlist stays in the cache; keys include mtime and size,
+# so changed playlists are never served stale.
+VIDEO_PLAYLIST_CACHE_TIMEOUT = int(os.getenv('VIDEO_PLAYLIST_CACHE_TIMEOUT', 60 * 60))
+
+# Seconds a serialized catalogue page stays cached; saves and deletes invalidate it earlier.
+VIDEO_LIST_CACHE_TIMEOUT = int(os.getenv('VIDEO_LIST_CACHE_TIMEOUT', 5 * 60))
+
+# Player heartbeats are buffered in Redis and written to WatchProgress by the
+# flush_watch_progress job every WATCH_PROGRESS_FLUSH_INTERVAL seconds, in
+# upserts of WATCH_PROGRESS_BATCH_SIZE rows.
+WATCH_PROGRESS_FLUSH_INTERVAL = int(os.getenv('WATCH_PROGRESS_FLUSH_INTERVAL', 60))
+WATCH_PROGRESS_BATCH_SIZE = int(os.getenv('WATCH_PROGRESS_BATCH_SIZE', 500))
+WATCH_PROGRESS_BUFFER_TTL = int(os.getenv('WATCH_PROGRESS_BUFFER_TTL', 7 * 24 * 60 * 60))
+
+# Segment requests are counted in Redis per video, rendition and bucket of
+# ANALYTICS_BUCKET_SECONDS and rolled up to VideoViewStats every
+# ANALYTICS_ROLLUP_INTERVAL seconds. Unique viewers of the last
+# ANALYTICS_TRENDING_HOURS rank the catalogue (?ordering=trending); the
+# caches of the ANALYTICS_HOT_TITLES top videos are pre-warmed, including the
+# first ANALYTICS_PREWARM_SEGMENTS segments of each rendition.
+ANALYTICS_BUCKET_SECONDS = int(os.getenv('ANALYTICS_BUCKET_SECONDS', 60 * 60))
+ANALYTICS_ROLLUP_INTERVAL = int(os.getenv('ANALYTICS_ROLLUP_INTERVAL', 5 * 60))
+ANALYTICS_TRENDING_HOURS = int(os.getenv('ANALYTICS_TRENDING_HOURS', 24))
+ANALYTICS_HOT_TITLES = int(os.getenv('ANALYTICS_HOT_TITLES', 20))
+ANALYTICS_PREWARM_SEGMENTS = int(os.getenv('ANALYTICS_PREWARM_SEGMENTS', 3))
+
+# Resumable uploads: partial files live in VIDEO_UPLOAD_DIR (same filesystem as
+# MEDIA_ROOT so finished uploads are moved, not copied). Each PATCH may carry at
+# most VIDEO_UPLOAD_MAX_CHUNK_SIZE bytes.
+VIDEO_UPLOAD_DIR = os.getenv('VIDEO_UPLOAD_DIR', str(BASE_DIR / 'media' / 'uploads'))
+VIDEO_UPLOAD_MAX_SIZE = int(os.getenv('VIDEO_UPLOAD_MAX_SIZE', 50 * 1024 ** 3))
+VIDEO_UPLOAD_MAX_CHUNK_SIZE = int(os.getenv('VIDEO_UPLOAD_MAX_CHUNK_SIZE', 64 * 1024 ** 2))
+
+# Thumbnails are rendered in one ffmpeg run for every width/format combination.
+VIDEO_THUMBNAIL_OFFSET = float(os.getenv('VIDEO_THUMBNAIL_OFFSET', 1.0))
+VIDEO_THUMBNAIL_WIDTHS = [320, 640, 1280]
+VIDEO_THUMBNAIL_FORMATS = ['jpg', 'webp']
+
+VIDEO_RENDITION_PRESETS = {
+    '360p': {'label': '360p', 'height': 360, 'video_bitrate': '800k', 'buffer_size': '1600k', 'audio_bitrate': '96k'},
+    '480p': {'label': '480p', 'height': 480, 'video_bitrate': '1400k', 'buffer_size': '2800k', 'audio_bitrate': '128k'},
+    '720p': {'label': '720p', 'height': 720, 'video_bitrate': '2800k', 'buffer_size': '5600k', 'audio_bitrate': '128k'},
+    '1080p': {'label': '1080p', 'height': 1080, 'video_bitrate': '5000k', 'buffer_size': '10000k', 'audio_bitrate': '192k'},
+}
+
+VIDEO_RENDITIONS = [
+    VIDEO_RENDITION_PRESETS[label.strip()]
+    for label in os.getenv('VIDEO_RENDITIONS', '480p,720p,1080p').split(',')
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     { 'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator', },
     { 'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', },
@@ -115,7 +237,41 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# --- Object Storage ---
+# Renditions and thumbnails are written through the 'renditions' storage:
+# MEDIA_ROOT with VIDEO_STORAGE='local', or an S3-compatible bucket (AWS S3,
+# MinIO, ...) with VIDEO_STORAGE='s3'. With S3, workers upload segments while
+# ffmpeg writes them and the segment views redirect to presigned URLs valid for
+# VIDEO_PRESIGNED_URL_TTL seconds, so web and worker nodes share no disk.
+# S3_PUBLIC_ENDPOINT_URL signs URLs for the address browsers use, if it differs
+# from S3_ENDPOINT_URL; thumbnail URLs stay valid for S3_URL_EXPIRE seconds.
+VIDEO_STORAGE = os.getenv('VIDEO_STORAGE', 'local')
+VIDEO_PRESIGNED_URL_TTL = int(os.getenv('VIDEO_PRESIGNED_URL_TTL', 60))
+
+if VIDEO_STORAGE == 's3':
+    RENDITION_STORAGE = {
+        'BACKEND': 'video_app.storage.RenditionS3Storage',
+        'OPTIONS': {
+            'bucket_name': os.getenv('S3_BUCKET_NAME', 'videoflix'),
+            'endpoint_url': os.getenv('S3_ENDPOINT_URL') or None,
+            'public_endpoint_url': os.getenv('S3_PUBLIC_ENDPOINT_URL') or None,
+            'access_key': os.getenv('S3_ACCESS_KEY_ID'),
+            'secret_key': os.getenv('S3_SECRET_ACCESS_KEY'),
+            'region_name': os.getenv('S3_REGION_NAME') or None,
+            'addressing_style': 'path',
+            'signature_version': 's3v4',
+            'file_overwrite': True,
+            'querystring_expire': int(os.getenv('S3_URL_EXPIRE', 60 * 60)),
+        },
+    }
+else:
+    RENDITION_STORAGE = {'BACKEND': 'django.core.files.storage.FileSystemStorage'}
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+    'renditions': RENDITION_STORAGE,
+}
 
 # --- CORS & CSRF Configuration ---
 CORS_ALLOW_ALL_ORIGINS = False
@@ -140,6 +296,14 @@ INTERNAL_IPS = [
 # --- Custom User Model ---
 AUTH_USER_MODEL = 'authentication_app.CustomUser'
 
+# Authenticated requests resolve their user from process memory (for
+# AUTH_USER_CACHE_LOCAL_TTL seconds), then Redis, then the database. Only the
+# fields authentication needs are cached, never the password hash. Saving a
+# user invalidates both tiers; other processes see the change within the local
+# TTL. QuerySet.update() on users must call `user_cache.invalidate_user`.
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 60))
+AUTH_USER_CACHE_LOCAL_TTL = float(os.getenv('AUTH_USER_CACHE_LOCAL_TTL', 5))
+
 # --- Email Configuration ---
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 
@@ -152,9 +316,30 @@ EMAIL_USE_SSL = os.getenv('EMAIL_USE_SSL', 'False').lower() == "true"
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "Videoflix <no-reply@videoflix.com>")
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5500')
 
+# Emails are queued in a Redis outbox and sent by the dispatch_emails job in
+# batches of EMAIL_BATCH_SIZE over one SMTP connection; a message is dropped
+# after EMAIL_MAX_ATTEMPTS failed attempts.
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 10))
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 50))
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+
 # --- REST Framework Configuration (JWT) ---
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'authentication_app.api.authentication.CookieJWTAuthentication', 
     ),
+    # Budgets of the sliding-window throttles on the password-hashing endpoints, per
+    # client IP and per target account ('<requests>/<s|min|hour|day>', empty = unlimited).
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv('THROTTLE_LOGIN_IP', '30/min') or None,
+        'login_email': os.getenv('THROTTLE_LOGIN_EMAIL', '10/min') or None,
+        'register_ip': os.getenv('THROTTLE_REGISTER_IP', '20/hour') or None,
+        'register_email': os.getenv('THROTTLE_REGISTER_EMAIL', '5/hour') or None,
+        'password_reset_ip': os.getenv('THROTTLE_PASSWORD_RESET_IP', '20/hour') or None,
+        'password_reset_email': os.getenv('THROTTLE_PASSWORD_RESET_EMAIL', '5/hour') or None,
+        'password_reset_confirm_ip': os.getenv('THROTTLE_PASSWORD_RESET_CONFIRM_IP', '20/hour') or None,
+        'password_reset_confirm_email': os.getenv('THROTTLE_PASSWORD_RESET_CONFIRM_EMAIL', '10/hour') or None,
+    },
+    # Number of proxies in front of the app, so client IPs are read from X-Forwarded-For.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES')) if os.getenv('NUM_PROXIES') else None,
 }
\ No newline at end of file
@@ -19,9 +19,12 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('django-rq/', include('django_rq.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('api/', include('authentication_app.api.urls')),
     path('api/', include('video_app.api.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,12 +1,42 @@
 from django.contrib import admin
-from .models import Video
+from .models import MediaAsset, Rendition, TranscodeJob, UploadSession, Video, VideoViewStats, WatchProgress
+
+
+class TranscodeJobInline(admin.TabularInline):
+    """
+    Read-only overview of the transcode jobs of a video.
+    """
+    model = TranscodeJob
+    extra = 0
+    can_delete = False
+    fields = ('kind', 'rendition', 'state', 'progress', 'fps', 'exit_status', 'started_at', 'finished_at')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class RenditionInline(admin.TabularInline):
+    """
+    Read-only overview of the finished renditions of a video.
+    """
+    model = Rendition
+    extra = 0
+    can_delete = False
+    fields = ('label', 'width', 'height', 'bandwidth', 'average_bandwidth', 'codecs', 'frame_rate')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
     """
     Admin interface configuration for the Video model.
     """
-    list_display = ('id', 'title', 'created_at')
+    list_display = ('id', 'title', 'created_at', 'trending_score')
+    inlines = [RenditionInline, TranscodeJobInline]
 
     def get_form(self, request, obj=None, **kwargs):
         """
@@ -14,4 +44,54 @@ class VideoAdmin(admin.ModelAdmin):
         """
         form = super().get_form(request, obj, **kwargs)
         form.base_fields['video_file'].required = True
-        return form
\ No newline at end of file
+        return form
+
+
+@admin.register(TranscodeJob)
+class TranscodeJobAdmin(admin.ModelAdmin):
+    """
+    Admin interface configuration for the TranscodeJob model.
+    """
+    list_display = ('id', 'video', 'kind', 'rendition', 'state', 'progress', 'fps', 'exit_status', 'created_at')
+    list_filter = ('state', 'kind')
+    readonly_fields = ('progress', 'fps', 'exit_status', 'error', 'started_at', 'finished_at')
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    """
+    Admin interface configuration for the UploadSession model.
+    """
+    list_display = ('id', 'filename', 'created_by', 'offset', 'size', 'state', 'video', 'updated_at')
+    list_filter = ('state',)
+    readonly_fields = ('offset', 'state', 'video', 'created_at', 'updated_at')
+
+
+@admin.register(MediaAsset)
+class MediaAssetAdmin(admin.ModelAdmin):
+    """
+    Admin interface configuration for the MediaAsset model.
+    """
+    list_display = ('id', 'content_hash', 'ref_count', 'created_at')
+    search_fields = ('content_hash',)
+    readonly_fields = ('content_hash', 'ref_count', 'created_at')
+
+
+@admin.register(WatchProgress)
+class WatchProgressAdmin(admin.ModelAdmin):
+    """
+    Admin interface configuration for the WatchProgress model.
+    """
+    list_display = ('id', 'user', 'video', 'position', 'updated_at')
+    readonly_fields = ('user', 'video', 'position', 'updated_at')
+
+
+
+@admin.register(VideoViewStats)
+class VideoViewStatsAdmin(admin.ModelAdmin):
+    """
+    Admin interface configuration for the VideoViewStats model.
+    """
+    list_display = ('video', 'rendition', 'bucket', 'segments', 'viewers')
+    list_filter = ('rendition',)
+    readonly_fields = ('video', 'rendition', 'bucket', 'segments', 'viewers')
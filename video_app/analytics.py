@@ -0,0 +1,167 @@
+"""
+View and popularity analytics from segment requests.
+
+Every served segment increments a counter and adds the viewer to a
+HyperLogLog per video, rendition and time bucket of ANALYTICS_BUCKET_SECONDS,
+all in one Redis round trip. The `rollup_view_stats` job copies the totals to
+VideoViewStats and recomputes `Video.trending_score`, the unique viewers over
+the last ANALYTICS_TRENDING_HOURS, which backs the trending catalogue order
+and the hot titles whose caches are pre-warmed.
+"""
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from .catalogue import bump_catalogue_version
+from .models import Video, VideoViewStats
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_KEY = 'analytics:buckets'
+
+# Catalogue order of `?ordering=trending`, backed by the `video_trending_idx` index.
+TRENDING_ORDERING = ('-trending_score', '-created_at', '-id')
+
+# Seconds a closed bucket is kept open for late requests before it is rolled up for the last time.
+BUCKET_GRACE = 60
+
+
+def segments_key(bucket):
+    """
+    Returns the Redis key of the hash counting segment requests per `<video>:<rendition>` in a bucket.
+    """
+    return f'analytics:segments:{bucket}'
+
+
+def viewers_key(bucket, field):
+    """
+    Returns the Redis key of the HyperLogLog of viewers of one `<video>:<rendition>` in a bucket.
+    """
+    return f'analytics:viewers:{bucket}:{field}'
+
+
+def count_segment(request, response, video_id, rendition, viewer_id):
+    """
+    Counts a served segment request for the analytics.
+
+    Only GET requests answered with 200 or 206, or redirected to object
+    storage with 302, are counted. Counting never
+    fails the request: if Redis is unavailable the request is not counted.
+    """
+    if request.method != 'GET' or response.status_code not in (200, 206, 302):
+        return
+
+    bucket = _bucket_start(time.time())
+    field = f'{video_id}:{rendition}'
+    ttl = 2 * settings.ANALYTICS_BUCKET_SECONDS + 24 * 60 * 60
+    try:
+        pipeline = get_redis_connection('default').pipeline(transaction=False)
+        pipeline.hincrby(segments_key(bucket), field, 1)
+        pipeline.expire(segments_key(bucket), ttl)
+        pipeline.pfadd(viewers_key(bucket, field), viewer_id)
+        pipeline.expire(viewers_key(bucket, field), ttl)
+        pipeline.sadd(BUCKETS_KEY, bucket)
+        pipeline.execute()
+    except RedisError:
+        logger.warning("Segment request of video %s not counted, Redis is unavailable", video_id, exc_info=True)
+
+
+def rollup(now=None):
+    """
+    Writes the counters of all buckets to VideoViewStats and updates the trending scores.
+
+    Open buckets are upserted with their running totals; closed buckets are
+    written one last time and then removed from Redis. Returns the number of
+    upserted rows.
+    """
+    now = now or time.time()
+    redis = get_redis_connection('default')
+    rows = []
+    closed = []
+
+    for bucket in sorted(int(bucket) for bucket in redis.smembers(BUCKETS_KEY)):
+        counts = {field.decode(): int(count) for field, count in redis.hgetall(segments_key(bucket)).items()}
+        pipeline = redis.pipeline(transaction=False)
+        for field in counts:
+            pipeline.pfcount(viewers_key(bucket, field))
+        viewers = pipeline.execute()
+
+        bucket_time = datetime.fromtimestamp(bucket, tz=timezone.utc)
+        for (field, segments), unique in zip(counts.items(), viewers):
+            video_id, rendition = field.split(':', 1)
+            rows.append(VideoViewStats(
+                video_id=int(video_id), rendition=rendition, bucket=bucket_time, segments=segments, viewers=unique,
+            ))
+
+        if bucket + settings.ANALYTICS_BUCKET_SECONDS + BUCKET_GRACE < now:
+            closed.append((bucket, list(counts)))
+
+    video_ids = set(Video.objects.filter(pk__in={row.video_id for row in rows}).values_list('pk', flat=True))
+    rows = [row for row in rows if row.video_id in video_ids]
+    VideoViewStats.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['video', 'rendition', 'bucket'],
+        update_fields=['segments', 'viewers'],
+    )
+
+    for bucket, fields in closed:
+        redis.delete(segments_key(bucket), *[viewers_key(bucket, field) for field in fields])
+        redis.srem(BUCKETS_KEY, bucket)
+
+    update_trending_scores(now)
+    return len(rows)
+
+
+def update_trending_scores(now=None):
+    """
+    Sets `Video.trending_score` to the viewers of the last ANALYTICS_TRENDING_HOURS.
+
+    Viewers are summed over buckets and renditions, so a viewer watching in
+    several hours or switching renditions counts more than once, which
+    weights the score towards watch time.
+
+    Only changed scores are written, and the catalogue cache is only
+    invalidated if any score changed.
+    """
+    since = datetime.fromtimestamp(now or time.time(), tz=timezone.utc)
+    since -= timedelta(hours=settings.ANALYTICS_TRENDING_HOURS)
+    scores = dict(
+        VideoViewStats.objects.filter(bucket__gte=since)
+        .values('video').annotate(score=Sum('viewers')).values_list('video', 'score')
+    )
+
+    with transaction.atomic():
+        current = dict(
+            Video.objects.filter(Q(trending_score__gt=0) | Q(pk__in=scores)).values_list('pk', 'trending_score')
+        )
+        changed = [
+            Video(pk=video_id, trending_score=scores.get(video_id, 0))
+            for video_id, score in current.items() if scores.get(video_id, 0) != score
+        ]
+        Video.objects.bulk_update(changed, ['trending_score'])
+
+    if changed:
+        transaction.on_commit(bump_catalogue_version)
+
+
+def hot_videos(limit=None):
+    """
+    Returns the ids of the currently most watched videos, hottest first.
+    """
+    limit = limit or settings.ANALYTICS_HOT_TITLES
+    return list(
+        Video.objects.filter(trending_score__gt=0)
+        .order_by(*TRENDING_ORDERING).values_list('pk', flat=True)[:limit]
+    )
+
+
+def _bucket_start(timestamp):
+    """
+    Internal helper returning the start of the time bucket a Unix timestamp falls into.
+    """
+    return int(timestamp) - int(timestamp) % settings.ANALYTICS_BUCKET_SECONDS
@@ -0,0 +1,153 @@
+"""
+Async variants of the playlist and segment views, used with SERVER_MODE=asgi.
+
+DRF views are synchronous, so these are plain Django views. They mirror
+`VideoStreamingView` and `VideoSegmentView`: the same signed-URL and cookie
+JWT authentication, the same lookups and the same delivery helpers (including
+the presigned redirects of object storage). Bodies are streamed from an async
+generator, so a slow client on a long segment only holds a coroutine on the
+event loop instead of a gunicorn worker.
+
+Blocking work (database lookups, file system calls, Redis round trips for
+metrics and analytics) runs in threads, so the event loop never waits on it.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+
+from authentication_app.api.authentication import CookieJWTAuthentication
+from core import metrics
+from ..analytics import count_segment
+from ..layout import resolve_playlist, resolve_segment
+from ..models import Video
+from ..storage import is_remote, playlist_object, segment_object
+from .authentication import SignedSegmentUser
+from .delivery import (
+    IMMUTABLE, read_playlist, read_stored_playlist, redirect_to_storage, serve_file, serve_playlist, served_bytes,
+)
+from .signing import verify_segment
+
+
+class AsyncMediaView(View):
+    """
+    Base class of the async media views, answering 404s with a JSON body like DRF does.
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404 as exc:
+            return JsonResponse({"detail": str(exc)}, status=404)
+
+
+class AsyncVideoStreamingView(AsyncMediaView):
+    """
+    Async endpoint serving the HLS playlist of a video rendition (see `VideoStreamingView`).
+
+    Example URL: /api/video/1/480p/index.m3u8
+    """
+    async def get(self, request, movie_id, resolution):
+        user = await _authenticate(request)
+        if user is None:
+            return _not_authenticated()
+
+        video = await aget_object_or_404(Video, pk=movie_id)
+        if is_remote():
+            playlist = await sync_to_async(read_stored_playlist)(playlist_object(video, resolution))
+            return serve_playlist(request, playlist, None, movie_id, resolution, user.pk)
+
+        playlist_path = await sync_to_async(resolve_playlist)(video, resolution)
+        if playlist_path is None:
+            raise Http404("Video or manifest not found.")
+
+        playlist, stat = await sync_to_async(read_playlist)(playlist_path)
+        return serve_playlist(request, playlist, stat, movie_id, resolution, user.pk)
+
+
+class AsyncVideoSegmentView(AsyncMediaView):
+    """
+    Async endpoint serving HLS video segments (see `VideoSegmentView`).
+
+    Requests carrying a valid segment signature are authorized without any JWT
+    decoding or database access; all others fall back to the cookie JWT.
+
+    Example URL: /api/video/1/480p/segment001.ts
+    """
+    async def get(self, request, movie_id, resolution, segment):
+        user = _signed_user(request, movie_id, resolution, segment)
+        video = None
+        if user is None:
+            user = await _authenticate(request)
+            if user is None:
+                return _not_authenticated()
+            video = await aget_object_or_404(Video, pk=movie_id)
+
+        # A valid signature is a bearer capability, so shared caches may keep the response.
+        visibility = 'public' if isinstance(user, SignedSegmentUser) else 'private'
+
+        if is_remote():
+            name = await sync_to_async(segment_object)(movie_id, resolution, segment, video)
+            if name is None:
+                raise Http404("Segment not found.")
+            response = await asyncio.to_thread(redirect_to_storage, name, visibility)
+            await asyncio.to_thread(count_segment, request, response, movie_id, resolution, user.pk)
+            return response
+
+        segment_path = await sync_to_async(resolve_segment)(movie_id, resolution, segment, video)
+        if segment_path is None:
+            raise Http404("Segment not found.")
+
+        response = await asyncio.to_thread(
+            serve_file, request, segment_path, 'video/MP2T', cache_control=f'{visibility}, {IMMUTABLE}',
+            asynchronous=True,
+        )
+        await asyncio.to_thread(_record_segment, request, response, segment_path, movie_id, resolution, user.pk)
+        return response
+
+
+def _record_segment(request, response, segment_path, movie_id, resolution, viewer_id):
+    """
+    Internal helper counting a served segment in the metrics and the analytics.
+    """
+    metrics.inc('videoflix_served_bytes_total', served_bytes(request, response, segment_path), rendition=resolution)
+    count_segment(request, response, movie_id, resolution, viewer_id)
+
+
+def _signed_user(request, movie_id, resolution, segment):
+    """
+    Internal helper returning the viewer of a validly signed segment URL, or None.
+    """
+    expires = request.GET.get('exp')
+    viewer_id = request.GET.get('u')
+    signature = request.GET.get('sig')
+
+    if not (expires and viewer_id and signature):
+        return None
+    if not verify_segment(movie_id, resolution, segment, expires, viewer_id, signature):
+        return None
+    return SignedSegmentUser(viewer_id)
+
+
+async def _authenticate(request):
+    """
+    Internal helper resolving the user of the JWT cookie, or None if it is missing or invalid.
+    """
+    try:
+        result = await sync_to_async(CookieJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def _not_authenticated():
+    """
+    Internal helper returning the 401 response DRF sends for unauthenticated requests.
+    """
+    response = JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
@@ -0,0 +1,387 @@
+import asyncio
+import hashlib
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from core import metrics
+
+from ..storage import rendition_storage, stored_playlist_cache_key
+from . import hot_cache
+from .signing import SIGNATURE_WINDOW, sign_playlist
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# Cache-Control for content that never changes once written (finished segments/playlists).
+IMMUTABLE = 'max-age=31536000, immutable'
+
+
+class FileRange:
+    """
+    File-like view on a byte range of an open file.
+
+    It exposes `fileno()` so WSGI servers with a `wsgi.file_wrapper` (gunicorn)
+    can hand the range to `os.sendfile`: the file descriptor is positioned at
+    the start of the range and the server caps the transfer at Content-Length.
+    Servers without sendfile support fall back to the bounded `read()`.
+    """
+    def __init__(self, file, start, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def serve_file(request, path, content_type, cache_control=None, asynchronous=False):
+    """
+    Returns a response delivering a media file according to VIDEO_DELIVERY_MODE.
+
+    - 'sendfile' (default): a FileResponse the WSGI server sends with
+      `os.sendfile` via `wsgi.file_wrapper` (zero-copy under gunicorn).
+    - 'python': the bytes are streamed through Python in fixed-size blocks.
+    - 'x-accel-redirect' / 'x-sendfile': the view only authorizes the request;
+      the front server (nginx / Apache, lighttpd) reads and sends the file itself,
+      including Range and HEAD handling.
+
+    The in-process modes support single HTTP byte ranges and HEAD requests and
+    answer If-None-Match / If-Modified-Since with 304 based on a strong ETag
+    derived from the file's mtime and size. The offload modes leave validators
+    to the front server and only pass `cache_control` on.
+
+    With `asynchronous` (async views under ASGI) the in-process modes stream
+    the bytes from an async generator, so a slow client only holds a
+    coroutine instead of a worker while the body is sent.
+
+    Bodies streamed through Python ('python' mode or `asynchronous`) are read
+    from the memory-mapped hot cache when it is enabled (see `hot_cache`);
+    'sendfile' is zero-copy already and always reads the file.
+    """
+    mode = settings.VIDEO_DELIVERY_MODE
+
+    if mode == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = _internal_url(path)
+        return _set_cache_headers(response, cache_control=cache_control)
+
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = str(path)
+        return _set_cache_headers(response, cache_control=cache_control)
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404("File not found.")
+
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return _set_cache_headers(not_modified, etag, last_modified, cache_control)
+
+    byte_range = None
+    if _if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = max(end - start + 1, 0)
+
+    buffer = None
+    if request.method != 'HEAD' and (mode == 'python' or asynchronous) and hot_cache.enabled():
+        buffer = hot_cache.get_segment(path, stat)
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    elif buffer is not None:
+        body = _aiter_buffer(buffer, start, length) if asynchronous else _iter_buffer(buffer, start, length)
+        response = StreamingHttpResponse(body, content_type=content_type)
+    elif asynchronous:
+        response = StreamingHttpResponse(_aiter_range(path, start, length), content_type=content_type)
+    elif mode == 'python':
+        response = StreamingHttpResponse(_iter_range(path, start, length), content_type=content_type)
+    else:
+        response = FileResponse(FileRange(open(path, 'rb'), start, length), content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Length'] = length
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return _set_cache_headers(response, etag, last_modified, cache_control)
+
+
+def serve_content(request, content, content_type, cache_control=None, last_modified=None):
+    """
+    Returns a response for generated content (e.g. a playlist) with a strong ETag.
+
+    The ETag is a hash of the exact bytes sent, so conditional requests are
+    answered with 304 whenever the client already holds the same body.
+    """
+    body = content.encode() if isinstance(content, str) else content
+    etag = '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest()
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return _set_cache_headers(not_modified, etag, last_modified, cache_control)
+
+    response = HttpResponse(body, content_type=content_type)
+    return _set_cache_headers(response, etag, last_modified, cache_control)
+
+
+def serve_playlist(request, playlist, stat, movie_id, resolution, viewer_id):
+    """
+    Returns the response for a variant playlist read with `read_playlist` or `read_stored_playlist`.
+
+    With VIDEO_SIGNED_URLS enabled, every segment URI is rewritten into a
+    short-lived HMAC-signed URL bound to the viewer. Playlists still being
+    written (no #EXT-X-ENDLIST yet) are marked `no-cache`; signed playlists
+    may be reused for one signature window, unsigned finished ones are immutable.
+    """
+    finished = '#EXT-X-ENDLIST' in playlist
+
+    if not settings.VIDEO_SIGNED_URLS:
+        cache_control = f'private, {IMMUTABLE}' if finished else 'private, no-cache'
+        return serve_content(
+            request, playlist, 'application/vnd.apple.mpegurl',
+            cache_control=cache_control, last_modified=int(stat.st_mtime) if stat else None
+        )
+
+    playlist = sign_playlist(playlist, movie_id, resolution, viewer_id)
+    cache_control = f'private, max-age={SIGNATURE_WINDOW}' if finished else 'private, no-cache'
+    return serve_content(request, playlist, 'application/vnd.apple.mpegurl', cache_control=cache_control)
+
+
+def read_playlist(path):
+    """
+    Returns the text and the stat result of a playlist, cached in the Django cache.
+
+    The cache key contains the file's mtime and size, so a playlist that is
+    still being written by ffmpeg is re-read as soon as it changes and a
+    finished playlist is only read from disk once per cache timeout. Finished
+    playlists in the hot cache are answered from process memory first.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404("Video or manifest not found.")
+
+    if hot_cache.enabled():
+        data = hot_cache.get_playlist(path, stat)
+        if data is not None:
+            return data.decode(), stat
+
+    path_hash = hashlib.md5(str(path).encode(), usedforsecurity=False).hexdigest()
+    cache_key = f'video:playlist:{path_hash}:{stat.st_mtime_ns}:{stat.st_size}'
+    playlist = cache.get(cache_key)
+    metrics.record_cache('playlist', playlist is not None)
+
+    if playlist is None:
+        try:
+            with open(path) as f:
+                playlist = f.read()
+        except FileNotFoundError:
+            raise Http404("Video or manifest not found.")
+        cache.set(cache_key, playlist, settings.VIDEO_PLAYLIST_CACHE_TIMEOUT)
+
+    return playlist, stat
+
+
+def read_stored_playlist(name):
+    """
+    Returns the text of a playlist in the rendition storage, cached in the Django cache.
+
+    Stored objects have no cheap mtime, so the entry is keyed by name and
+    dropped by the worker whenever it uploads a new version of the playlist
+    (see `RenditionPublisher`).
+    """
+    if name is None:
+        raise Http404("Video or manifest not found.")
+
+    cache_key = stored_playlist_cache_key(name)
+    playlist = cache.get(cache_key)
+    metrics.record_cache('playlist', playlist is not None)
+
+    if playlist is None:
+        try:
+            with rendition_storage().open(name) as f:
+                playlist = f.read().decode()
+        except FileNotFoundError:
+            raise Http404("Video or manifest not found.")
+        cache.set(cache_key, playlist, settings.VIDEO_PLAYLIST_CACHE_TIMEOUT)
+
+    return playlist
+
+
+def redirect_to_storage(name, visibility='private'):
+    """
+    Returns a redirect to a presigned URL of an object in the rendition storage.
+
+    The URL is valid for VIDEO_PRESIGNED_URL_TTL seconds and the redirect may
+    be cached for half of that, so a cached redirect never points at an
+    expired URL. The bytes go straight from the bucket to the client.
+    """
+    ttl = settings.VIDEO_PRESIGNED_URL_TTL
+    response = HttpResponseRedirect(rendition_storage().url(name, expire=ttl))
+    return _set_cache_headers(response, cache_control=f'{visibility}, max-age={ttl // 2}')
+
+
+def served_bytes(request, response, path):
+    """
+    Returns the number of body bytes a `serve_file` response delivers.
+
+    Offloaded responses have no body of their own, so the file size is
+    counted for them (an upper bound if the front server answers a range).
+    """
+    if request.method == 'HEAD' or response.status_code not in (200, 206):
+        return 0
+    if response.has_header('X-Accel-Redirect') or response.has_header('X-Sendfile'):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+    return int(response.get('Content-Length', 0))
+
+
+def parse_range(header, size):
+    """
+    Parses a single-range `Range` header.
+
+    Returns a (start, end) tuple, None if the header is absent or should be
+    ignored (multiple ranges, other units), or False if it is unsatisfiable.
+    """
+    if not header:
+        return None
+
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            return False
+        return max(size - suffix, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    """
+    Internal helper evaluating If-Range: a stale validator turns a range request into a full one.
+    """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _set_cache_headers(response, etag=None, last_modified=None, cache_control=None):
+    """
+    Internal helper adding validators and Cache-Control to a response.
+    """
+    if etag:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    if cache_control:
+        response['Cache-Control'] = cache_control
+    return response
+
+
+def _iter_range(path, start, length):
+    """
+    Internal generator that streams a byte range of a file in fixed-size blocks.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(STREAM_BLOCK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+async def _aiter_range(path, start, length):
+    """
+    Internal async generator that streams a byte range of a file in fixed-size blocks.
+
+    Disk reads run in the default thread pool, so the event loop keeps
+    serving other clients while a block is read.
+    """
+    f = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(f.seek, start)
+        while length > 0:
+            data = await asyncio.to_thread(f.read, min(STREAM_BLOCK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def _iter_buffer(buffer, start, length):
+    """
+    Internal generator that streams a byte range of an in-memory buffer in fixed-size blocks.
+    """
+    for offset in range(start, start + length, STREAM_BLOCK_SIZE):
+        yield buffer[offset:min(offset + STREAM_BLOCK_SIZE, start + length)]
+
+
+async def _aiter_buffer(buffer, start, length):
+    """
+    Internal async generator over `_iter_buffer`; memory reads do not block the event loop.
+    """
+    for block in _iter_buffer(buffer, start, length):
+        yield block
+
+
+def _internal_url(path):
+    """
+    Internal helper mapping a file below MEDIA_ROOT onto the front server's internal location.
+    """
+    relative = os.path.relpath(path, settings.MEDIA_ROOT)
+    if relative.startswith('..'):
+        raise Http404("File not found.")
+    return settings.VIDEO_ACCEL_REDIRECT_PREFIX + quote(relative.replace(os.sep, '/'))
@@ -0,0 +1,137 @@
+"""
+In-memory tier for hot segments and playlists, bounded by VIDEO_HOT_CACHE_BYTES.
+
+Segments are kept as read-only memory maps. The mapped pages belong to the
+kernel page cache, so every worker process maps the same physical memory
+instead of holding its own copy, and a hit costs no open/read syscalls.
+Finished playlists are small and kept as bytes. Entries are evicted in
+least-recently-used order once the mapped bytes of a process exceed the
+budget; hits, misses and evictions are exported as metrics.
+
+Entries are validated against the file's current mtime and size on every
+lookup. Files younger than MIN_AGE seconds are not cached, since ffmpeg may
+still be writing them.
+"""
+import mmap
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core import metrics
+
+# Seconds a file must stay unmodified before it is cached.
+MIN_AGE = 30
+
+# Files larger than this fraction of the budget are never cached, so one file cannot flush the cache.
+MAX_ENTRY_FRACTION = 8
+
+# path -> (mtime_ns, size, buffer), least recently used first.
+_entries = OrderedDict()
+_lock = threading.Lock()
+_size = 0
+
+
+def enabled():
+    """
+    Checks whether the hot cache is enabled (VIDEO_HOT_CACHE_BYTES > 0).
+    """
+    return settings.VIDEO_HOT_CACHE_BYTES > 0
+
+
+def get_segment(path, stat):
+    """
+    Returns a read-only memory map of a segment, or None if it is not cacheable.
+
+    `stat` is the caller's current stat result of the file.
+    """
+    return _get('segment', path, stat, _map_file)
+
+
+def get_playlist(path, stat):
+    """
+    Returns the bytes of a finished playlist, or None if it is not cacheable.
+
+    Playlists without #EXT-X-ENDLIST are still growing and are not kept.
+    """
+    return _get('playlist', path, stat, _read_finished_playlist)
+
+
+def clear():
+    """
+    Drops all entries of this process.
+    """
+    global _size
+    with _lock:
+        _entries.clear()
+        _size = 0
+
+
+def _get(kind, path, stat, load):
+    """
+    Internal helper looking up a file and loading it with `load` on a miss.
+    """
+    path = str(path)
+    with _lock:
+        entry = _entries.get(path)
+        if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+            _entries.move_to_end(path)
+            metrics.record_cache(f'hot_{kind}', True)
+            return entry[2]
+    metrics.record_cache(f'hot_{kind}', False)
+
+    budget = settings.VIDEO_HOT_CACHE_BYTES
+    if not stat.st_size or stat.st_size > budget // MAX_ENTRY_FRACTION or time.time() - stat.st_mtime < MIN_AGE:
+        return None
+
+    buffer = load(path, stat.st_size)
+    if buffer is not None:
+        _store(path, (stat.st_mtime_ns, stat.st_size, buffer), budget)
+    return buffer
+
+
+def _store(path, entry, budget):
+    """
+    Internal helper adding an entry and evicting least recently used ones beyond the budget.
+
+    Evicted maps are not closed explicitly: responses still streaming from
+    them keep them alive, and they are unmapped once the last one finishes.
+    """
+    global _size
+    evicted = 0
+    with _lock:
+        previous = _entries.pop(path, None)
+        if previous is not None:
+            _size -= previous[1]
+        _entries[path] = entry
+        _size += entry[1]
+        while _size > budget:
+            _, (_, size, _) = _entries.popitem(last=False)
+            _size -= size
+            evicted += 1
+    if evicted:
+        metrics.inc('videoflix_cache_evictions_total', evicted, cache='hot')
+
+
+def _map_file(path, size):
+    """
+    Internal helper mapping a file read-only into memory.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _read_finished_playlist(path, size):
+    """
+    Internal helper reading a playlist, or None if it is still being written.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return data if len(data) == size and b'#EXT-X-ENDLIST' in data else None
@@ -0,0 +1,105 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+
+
+class VideoCursorPagination(CursorPagination):
+    """
+    Keyset pagination of the catalogue on (created_at, id), newest first.
+
+    The cursor holds the `created_at` and `id` of the last video of a page,
+    and the next page is fetched with
+    `WHERE created_at < c OR (created_at = c AND id < i)` on the
+    `video_created_idx` index. No offset is involved, so videos sharing a
+    timestamp are never skipped or repeated, inserts and deletes between two
+    requests do not shift later pages, and the cost of a page does not grow
+    with the catalogue. Previous links walk the same index in ascending order.
+    Pagination is opt-in: requests without `cursor` or `page_size` still
+    receive the plain list the frontend expects.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        if self.cursor is not None:
+            created_at, pk = self._parse_position(self.cursor.position)
+            if reverse:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        queryset = queryset.order_by(*(('created_at', 'id') if reverse else self.ordering))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        # A reversed page was reached from the page after it, a forward one from the page before it.
+        self.has_next = True if reverse else has_more
+        self.has_previous = has_more if reverse else self.cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._position(self.page[0])))
+
+    def _position(self, video):
+        """
+        Internal helper encoding the keyset of a video as `<created_at ISO 8601>|<id>`.
+        """
+        return f'{video.created_at.isoformat()}|{video.pk}'
+
+    def _parse_position(self, position):
+        """
+        Internal helper decoding a keyset written by `_position`; raises NotFound for invalid cursors.
+        """
+        created_at, _, pk = (position or '').rpartition('|')
+        try:
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+
+class TrendingPagination(PageNumberPagination):
+    """
+    Page-number pagination of the trending catalogue (`?ordering=trending`).
+
+    Trending scores are not unique and every rollup rewrites them, so a
+    cursor on the score cannot be followed reliably: pages are numbered
+    slices of the current order instead. A rollup between two requests may
+    move a video across a page boundary, but paging always ends. Like the
+    cursor pagination it is opt-in via `page` or `page_size`.
+    """
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
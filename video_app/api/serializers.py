@@ -1,13 +1,68 @@
+from django.conf import settings
 from rest_framework import serializers
-from ..models import Video
+from ..models import Rendition, UploadSession, Video
+from ..storage import rendition_storage
+
+
+class RenditionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the finished renditions of a video.
+    """
+    class Meta:
+        model = Rendition
+        fields = ['label', 'width', 'height', 'bandwidth', 'average_bandwidth', 'codecs', 'frame_rate']
+
 
 class VideoSerializer(serializers.ModelSerializer):
     """
     Serializer for the Video model.
     Maps the 'thumbnail' field to 'thumbnail_url' to match frontend requirements.
+    'thumbnail_variants' maps each generated size/format (e.g. '640w.webp') to its URL.
+    The probed source metadata and the finished renditions are exposed read-only.
     """
     thumbnail_url = serializers.ImageField(source='thumbnail', read_only=True)
+    thumbnail_variants = serializers.SerializerMethodField()
+    renditions = RenditionSerializer(many=True, read_only=True)
 
     class Meta:
         model = Video
-        fields = ['id', 'created_at', 'title', 'description', 'thumbnail_url', 'category']
\ No newline at end of file
+        fields = [
+            'id', 'created_at', 'title', 'description', 'thumbnail_url', 'thumbnail_variants', 'category',
+            'duration', 'width', 'height', 'bitrate', 'frame_rate', 'video_codec', 'audio_codec', 'renditions',
+        ]
+
+    def get_thumbnail_variants(self, obj):
+        request = self.context.get('request')
+        variants = {}
+        for key, name in obj.thumbnail_variants.items():
+            url = rendition_storage().url(name)
+            variants[key] = request.build_absolute_uri(url) if request else url
+        return variants
+
+
+class WatchProgressSerializer(serializers.Serializer):
+    """
+    Serializer for a player heartbeat carrying the playback position in seconds.
+    """
+    position = serializers.FloatField(min_value=0)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for resumable upload sessions.
+    The client announces file name, total size and the video details; the
+    offset, state and resulting video are maintained by the server.
+    """
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'filename', 'size', 'offset', 'state', 'title', 'description', 'category', 'video', 'created_at',
+        ]
+        read_only_fields = ['id', 'offset', 'state', 'video', 'created_at']
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Size must be greater than zero.")
+        if value > settings.VIDEO_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Uploads are limited to {settings.VIDEO_UPLOAD_MAX_SIZE} bytes.")
+        return value
@@ -0,0 +1,78 @@
+import base64
+import math
+import time
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+KEY_SALT = 'video_app.segment'
+
+# Expiry times are counted from the end of the current window of this many
+# seconds, so a signed playlist is byte-identical (and therefore cacheable by
+# ETag) within one window and no URL expires earlier than its TTL.
+SIGNATURE_WINDOW = 60
+
+
+def sign_segment(movie_id, resolution, segment, expires, viewer_id):
+    """
+    Returns the HMAC signature authorizing one segment URL until `expires`.
+    """
+    value = f'{movie_id}/{resolution}/{segment}/{expires}/{viewer_id}'
+    digest = salted_hmac(KEY_SALT, value, secret=settings.VIDEO_SIGNING_KEY, algorithm='sha256').digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def verify_segment(movie_id, resolution, segment, expires, viewer_id, signature):
+    """
+    Checks a segment signature without touching the database.
+
+    Returns False for malformed, expired or forged signatures.
+    """
+    try:
+        if int(expires) < time.time():
+            return False
+    except (TypeError, ValueError):
+        return False
+
+    expected = sign_segment(movie_id, resolution, segment, expires, viewer_id)
+    return constant_time_compare(expected, signature)
+
+
+def sign_playlist(playlist, movie_id, resolution, viewer_id):
+    """
+    Rewrites every segment URI of a media playlist into a signed, expiring URL.
+
+    Each URL stays valid for at least VIDEO_SIGNED_URL_TTL seconds after the
+    point in the video where its segment starts, so a short TTL still covers
+    a full playback of a long film. The URLs keep pointing at the segment
+    endpoint relative to the playlist (`<segment>/?exp=...&u=...&sig=...`).
+    """
+    now = math.ceil(time.time() / SIGNATURE_WINDOW) * SIGNATURE_WINDOW
+    ttl = settings.VIDEO_SIGNED_URL_TTL
+    offset = 0.0
+    duration = 0.0
+    lines = []
+
+    for line in playlist.splitlines():
+        stripped = line.strip()
+
+        if stripped.startswith('#EXTINF:'):
+            try:
+                duration = float(stripped[len('#EXTINF:'):].split(',')[0])
+            except ValueError:
+                duration = 0.0
+        elif stripped and not stripped.startswith('#'):
+            expires = now + ttl + int(offset)
+            query = urlencode({
+                'exp': expires,
+                'u': viewer_id,
+                'sig': sign_segment(movie_id, resolution, stripped, expires, viewer_id),
+            })
+            line = f'{quote(stripped)}/?{query}'
+            offset += duration
+            duration = 0.0
+
+        lines.append(line)
+
+    return '\n'.join(lines) + '\n'
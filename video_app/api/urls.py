@@ -1,8 +1,24 @@
+from django.conf import settings
 from django.urls import path
-from .views import VideoListView, VideoStreamingView, VideoSegmentView 
+
+from .async_views import AsyncVideoSegmentView, AsyncVideoStreamingView
+from .views import (
+    UploadSessionCreateView, UploadSessionView, VideoListView, VideoMasterPlaylistView, VideoStreamingView,
+    VideoSegmentView, WatchProgressView,
+)
+
+# Under ASGI, playlists and segments are served by async views.
+if settings.SERVER_MODE == 'asgi':
+    streaming_view, segment_view = AsyncVideoStreamingView, AsyncVideoSegmentView
+else:
+    streaming_view, segment_view = VideoStreamingView, VideoSegmentView
 
 urlpatterns = [
     path('video/', VideoListView.as_view(), name='video-list'),
-    path('video/<int:movie_id>/<str:resolution>/index.m3u8', VideoStreamingView.as_view(), name='video-stream'),
-    path('video/<int:movie_id>/<str:resolution>/<str:segment>/', VideoSegmentView.as_view(), name='video-segment'),
+    path('video/<int:movie_id>/master.m3u8', VideoMasterPlaylistView.as_view(), name='video-master'),
+    path('video/<int:movie_id>/progress/', WatchProgressView.as_view(), name='video-progress'),
+    path('video/<int:movie_id>/<str:resolution>/index.m3u8', streaming_view.as_view(), name='video-stream'),
+    path('video/<int:movie_id>/<str:resolution>/<str:segment>/', segment_view.as_view(), name='video-segment'),
+    path('uploads/', UploadSessionCreateView.as_view(), name='video-upload-create'),
+    path('uploads/<uuid:upload_id>/', UploadSessionView.as_view(), name='video-upload'),
 ]
\ No newline at end of file
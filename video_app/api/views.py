@@ -1,63 +1,332 @@
-# 1. Standard Library Imports
-import os
-
-# 2. Third-Party Library Imports (Django & REST Framework)
-from django.http import FileResponse, Http404
+# 1. Third-Party Library Imports (Django & REST Framework)
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from rest_framework import generics, views
-from rest_framework.permissions import IsAuthenticated
+from django.urls import reverse
+from rest_framework import generics, status, views
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# 2. Local Application Imports
+from core import metrics
+from ..analytics import TRENDING_ORDERING, count_segment
+from ..catalogue import catalogue_cache_key
+from ..layout import resolve_playlist, resolve_segment
+from ..models import Rendition, UploadSession, Video
+from ..progress import get_position, get_positions, record_progress
+from ..renditions import build_master_playlist, master_playlist_cache_key
+from ..storage import is_remote, playlist_object, segment_object
+from ..uploads import ChecksumMismatch, abort_upload, complete_upload, parse_checksum, write_chunk
+from .authentication import SignedSegmentAuthentication, SignedSegmentUser
+from .delivery import (
+    IMMUTABLE, read_playlist, read_stored_playlist, redirect_to_storage, serve_content, serve_file, serve_playlist,
+    served_bytes,
+)
+from .pagination import TrendingPagination, VideoCursorPagination
+from .serializers import UploadSessionSerializer, VideoSerializer, WatchProgressSerializer
+
+# Status code defined by the tus checksum extension for a chunk that failed verification.
+HTTP_460_CHECKSUM_MISMATCH = 460
 
-# 3. Local Application Imports
-from ..models import Video
-from .serializers import VideoSerializer
 
 class VideoListView(generics.ListAPIView):
     """
     API endpoint that returns a list of all videos ordered by creation date (DESC).
     Requires JWT authentication.
+
+    Supports `?category=<name>` filtering, `?ordering=trending` (most watched
+    over the last ANALYTICS_TRENDING_HOURS first) and cursor pagination via
+    `?cursor=` and `?page_size=` (see `VideoCursorPagination`; the trending
+    order is paged by `?page=` instead, see `TrendingPagination`). Serialized
+    pages are cached and invalidated whenever a video or rendition changes.
+
+    Every video carries the requesting user's `resume_position` (seconds, or
+    null). The positions are read once per request and merged into the shared
+    cached page, so the cache stays per-URL and no per-video queries are made.
     """
-    queryset = Video.objects.all().order_by('-created_at')
+    queryset = Video.objects.prefetch_related('renditions').order_by('-created_at', '-id')
     serializer_class = VideoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = VideoCursorPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            trending = self.request.query_params.get('ordering') == 'trending'
+            self._paginator = TrendingPagination() if trending else self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        category = self.request.query_params.get('category')
+        if category:
+            if category not in dict(Video.CATEGORY_CHOICES):
+                raise ValidationError({'category': f"Unknown category '{category}'."})
+            queryset = queryset.filter(category=category)
+
+        ordering = self.request.query_params.get('ordering')
+        if ordering == 'trending':
+            queryset = queryset.order_by(*TRENDING_ORDERING)
+        elif ordering not in (None, 'newest'):
+            raise ValidationError({'ordering': f"Unknown ordering '{ordering}'."})
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        cache_key = catalogue_cache_key(request.build_absolute_uri())
+        data = cache.get(cache_key)
+        metrics.record_cache('catalogue', data is not None)
+
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(cache_key, data, settings.VIDEO_LIST_CACHE_TIMEOUT)
+
+        positions = get_positions(request.user.pk)
+        if isinstance(data, list):
+            return Response(_with_positions(data, positions))
+        return Response({**data, 'results': _with_positions(data['results'], positions)})
+
+
+class VideoMasterPlaylistView(views.APIView):
+    """
+    API endpoint to serve the adaptive HLS master playlist of a video.
+
+    The playlist lists every finished rendition with BANDWIDTH, RESOLUTION and
+    CODECS so players can switch bitrate during playback. It is built from the
+    stored rendition metadata and cached until a rendition changes. Clients
+    revalidate it by ETag, since new renditions can still be added.
+
+    Example URL: /api/video/1/master.m3u8
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, movie_id):
+        cache_key = master_playlist_cache_key(movie_id)
+        playlist = cache.get(cache_key)
+        metrics.record_cache('master_playlist', playlist is not None)
+
+        if playlist is None:
+            renditions = list(Rendition.objects.filter(video_id=movie_id))
+            if not renditions:
+                raise Http404("Video or renditions not found.")
+
+            playlist = build_master_playlist(renditions)
+            cache.set(cache_key, playlist, None)
+
+        return serve_content(request, playlist, 'application/vnd.apple.mpegurl', cache_control='private, no-cache')
 
 
 class VideoStreamingView(views.APIView):
     """
     API endpoint to serve HLS master playlist for a specific video and resolution.
-    
+
+    With VIDEO_SIGNED_URLS enabled, every segment URI is rewritten into a
+    short-lived HMAC-signed URL bound to the requesting user.
+
+    The playlist text is read through the cache and answered with an ETag, so
+    unchanged playlists are revalidated with 304 (see `serve_playlist` for
+    the Cache-Control rules). With VIDEO_STORAGE='s3' the playlist is read
+    from the rendition storage instead of MEDIA_ROOT.
+
     Example URL: /api/video/1/480p/index.m3u8
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, movie_id, resolution):
         video = get_object_or_404(Video, pk=movie_id)
-        video_path = video.video_file.path
-        base, _ = os.path.splitext(video_path)
-        playlist_path = f"{base}_{resolution}.m3u8"
+        if is_remote():
+            playlist = read_stored_playlist(playlist_object(video, resolution))
+            return serve_playlist(request, playlist, None, movie_id, resolution, request.user.pk)
 
-        if not os.path.exists(playlist_path):
+        playlist_path = resolve_playlist(video, resolution)
+        if playlist_path is None:
             raise Http404("Video or manifest not found.")
-        
-        return FileResponse(open(playlist_path, 'rb'), content_type='application/vnd.apple.mpegurl')
+
+        playlist, stat = read_playlist(playlist_path)
+        return serve_playlist(request, playlist, stat, movie_id, resolution, request.user.pk)
     
     
 class VideoSegmentView(views.APIView):
     """
     API endpoint to serve HLS video segments (.ts files).
-    
+
+    The bytes are delivered according to VIDEO_DELIVERY_MODE (see `serve_file`),
+    including support for HTTP Range, HEAD and conditional requests. Segments
+    never change once listed in a playlist, so they are sent as immutable.
+
+    Segments are looked up in the video's own rendition directory; names that
+    are not plain `.ts` file names are rejected. With VIDEO_STORAGE='s3' the
+    response is a redirect to a short-lived presigned URL of the segment (see
+    `redirect_to_storage`), so the bytes never pass through this process.
+
+    Requests carrying a valid segment signature are authorized without any JWT
+    decoding or database access; all others fall back to the cookie JWT.
+
     Example URL: /api/video/1/480p/segment001.ts
     """
+    authentication_classes = [SignedSegmentAuthentication] + api_settings.DEFAULT_AUTHENTICATION_CLASSES
     permission_classes = [IsAuthenticated]
 
     def get(self, request, movie_id, resolution, segment):
-        video = get_object_or_404(Video, pk=movie_id)
-        
-        video_directory = os.path.dirname(video.video_file.path)
-        
-        segment_path = os.path.join(video_directory, segment)
+        video = None
+        if not isinstance(request.user, SignedSegmentUser):
+            video = get_object_or_404(Video, pk=movie_id)
+
+        # A valid signature is a bearer capability, so shared caches may keep the response.
+        visibility = 'public' if isinstance(request.user, SignedSegmentUser) else 'private'
 
-        if not os.path.exists(segment_path):
+        if is_remote():
+            name = segment_object(movie_id, resolution, segment, video)
+            if name is None:
+                raise Http404("Segment not found.")
+            response = redirect_to_storage(name, visibility)
+            count_segment(request, response, movie_id, resolution, request.user.pk)
+            return response
+
+        segment_path = resolve_segment(movie_id, resolution, segment, video)
+        if segment_path is None:
             raise Http404("Segment not found.")
 
-        return FileResponse(open(segment_path, 'rb'), content_type='video/MP2T')
\ No newline at end of file
+        response = serve_file(request, segment_path, 'video/MP2T', cache_control=f'{visibility}, {IMMUTABLE}')
+        metrics.inc('videoflix_served_bytes_total', served_bytes(request, response, segment_path), rendition=resolution)
+        count_segment(request, response, movie_id, resolution, request.user.pk)
+        return response
+
+
+class WatchProgressView(views.APIView):
+    """
+    API endpoint for the playback position of the requesting user in a video.
+
+    GET returns the resume position (null if the video was never started).
+    PUT is the player heartbeat: the position is buffered in Redis and
+    written to the database in batches by `flush_watch_progress`, so
+    heartbeats never query the database.
+
+    Example URL: /api/video/1/progress/
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, movie_id):
+        return Response({"video": movie_id, "position": get_position(request.user.pk, movie_id)})
+
+    def put(self, request, movie_id):
+        serializer = WatchProgressSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        record_progress(request.user.pk, movie_id, serializer.validated_data['position'])
+        return Response({"video": movie_id, **serializer.validated_data})
+
+
+class UploadSessionCreateView(generics.CreateAPIView):
+    """
+    API endpoint to start a resumable upload of a source video (admins only).
+
+    The response carries the session URL in `Location`; the file is then
+    sent to that URL in chunks (see `UploadSessionView`).
+
+    Example URL: POST /api/uploads/
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAdminUser]
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response['Location'] = reverse('video-upload', args=[response.data['id']])
+        response['Upload-Offset'] = '0'
+        return response
+
+
+class UploadSessionView(views.APIView):
+    """
+    API endpoint for one resumable upload session, modelled on the tus protocol.
+
+    - GET / HEAD: returns the session, with `Upload-Offset` and `Upload-Length`
+      headers telling the client where to resume.
+    - PATCH: appends one chunk. The body is raw bytes
+      (`Content-Type: application/offset+octet-stream`) and `Upload-Offset` must
+      match the server's offset. An optional `Upload-Checksum: sha256 <base64>`
+      header is verified before the chunk is accepted. The Video is created
+      when the last chunk has arrived.
+    - DELETE: aborts the upload and removes the partial file.
+
+    Example URL: /api/uploads/<uuid>/
+    """
+    permission_classes = [IsAdminUser]
+    parser_classes = []
+
+    def get(self, request, upload_id):
+        session = get_object_or_404(UploadSession, pk=upload_id, created_by=request.user)
+        return self._with_offset(Response(UploadSessionSerializer(session).data), session)
+
+    def patch(self, request, upload_id):
+        if request.content_type != 'application/offset+octet-stream':
+            return Response(
+                {"detail": "Content-Type must be application/offset+octet-stream."},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response({"detail": "Upload-Offset and Content-Length are required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            checksum = parse_checksum(request.headers.get('Upload-Checksum'))
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if length > settings.VIDEO_UPLOAD_MAX_CHUNK_SIZE:
+            return Response({"detail": "Chunk is too large."}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        # The row lock serializes concurrent PATCHes of the same session.
+        with transaction.atomic():
+            session = get_object_or_404(
+                UploadSession.objects.select_for_update(), pk=upload_id, created_by=request.user
+            )
+
+            if session.state != UploadSession.STATE_ACTIVE:
+                return Response({"detail": f"Upload is {session.state}."}, status=status.HTTP_409_CONFLICT)
+            if offset != session.offset:
+                response = Response({"detail": "Upload-Offset does not match."}, status=status.HTTP_409_CONFLICT)
+                return self._with_offset(response, session)
+            if offset + length > session.size:
+                return Response({"detail": "Chunk exceeds the announced size."}, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                new_offset = write_chunk(session, request.stream, length, checksum) if length else offset
+            except ChecksumMismatch as exc:
+                return self._with_offset(Response({"detail": str(exc)}, status=HTTP_460_CHECKSUM_MISMATCH), session)
+
+            UploadSession.objects.filter(pk=session.pk).update(offset=new_offset)
+            session.offset = new_offset
+
+            if session.offset == session.size:
+                complete_upload(session)
+
+        return self._with_offset(Response(status=status.HTTP_204_NO_CONTENT), session)
+
+    def delete(self, request, upload_id):
+        session = get_object_or_404(UploadSession, pk=upload_id, created_by=request.user)
+        if session.state == UploadSession.STATE_COMPLETED:
+            return Response({"detail": "Upload is completed."}, status=status.HTTP_409_CONFLICT)
+        abort_upload(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def _with_offset(self, response, session):
+        response['Upload-Offset'] = str(session.offset)
+        response['Upload-Length'] = str(session.size)
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+def _with_positions(videos, positions):
+    """
+    Internal helper returning copies of serialized videos with the user's resume positions added.
+    """
+    return [{**video, 'resume_position': positions.get(video['id'])} for video in videos]
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import shutil
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .layout import asset_dir, output_dir
+from .models import MediaAsset, Video
+from .storage import delete_prefix, prefix_cache_key, storage_prefix
+
+# Bytes read per iteration while hashing, which bounds the memory used for large sources.
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """
+    Returns the hex SHA-256 of a file, read in fixed-size blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def acquire_asset(video, content_hash):
+    """
+    Attaches a video to the media asset of its content hash, creating it if needed.
+
+    Returns a tuple of the asset and whether it was created. The reference is
+    only taken once per video, so re-running the ingest stage is harmless.
+    """
+    with transaction.atomic():
+        asset, created = MediaAsset.objects.select_for_update().get_or_create(content_hash=content_hash)
+        taken = Video.objects.filter(pk=video.pk, asset__isnull=True).update(content_hash=content_hash, asset=asset)
+        if taken:
+            MediaAsset.objects.filter(pk=asset.pk).update(ref_count=F('ref_count') + 1)
+
+    video.content_hash = content_hash
+    video.asset = asset
+    # The outputs now live in the asset's directory, also in object storage.
+    cache.delete(prefix_cache_key(video.pk))
+    return asset, created
+
+
+def release_asset(video):
+    """
+    Drops the reference of a deleted video on its media asset.
+
+    The video's own output link is always removed; the shared output
+    directory (local and in object storage) and the asset row only go away
+    with the last reference.
+    """
+    link = output_dir(video.pk)
+    if os.path.islink(link):
+        os.unlink(link)
+
+    if video.asset_id is None:
+        return
+
+    with transaction.atomic():
+        asset = MediaAsset.objects.select_for_update().filter(pk=video.asset_id).first()
+        if asset is None:
+            return
+        if asset.ref_count > 1:
+            MediaAsset.objects.filter(pk=asset.pk).update(ref_count=F('ref_count') - 1)
+            return
+        asset.delete()
+
+    shutil.rmtree(asset_dir(asset.content_hash), ignore_errors=True)
+    delete_prefix(storage_prefix(video))
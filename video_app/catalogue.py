@@ -0,0 +1,38 @@
+import hashlib
+
+from django.core.cache import cache
+
+VERSION_KEY = 'video:list:version'
+
+
+def catalogue_version():
+    """
+    Returns the current version of the cached catalogue pages.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def catalogue_cache_key(url):
+    """
+    Returns the cache key of one catalogue page, identified by its absolute request URL.
+
+    The key embeds the catalogue version, so bumping the version invalidates
+    every cached page at once without having to know their keys.
+    """
+    url_hash = hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+    return f'video:list:{catalogue_version()}:{url_hash}'
+
+
+def bump_catalogue_version():
+    """
+    Invalidates all cached catalogue pages.
+    """
+    cache.add(VERSION_KEY, 1, None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
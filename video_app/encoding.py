@@ -0,0 +1,222 @@
+"""
+ffmpeg commands of the transcode pipeline.
+
+Every transcode mode (see VIDEO_TRANSCODE_MODE) is assembled from these
+builders: `ladder_cmd` for 'ladder', `rendition_cmd` for 'per_rendition' and
+`split_cmd`, `chunk_cmd`, `audio_cmd` and `stitch_cmd` for 'chunked'. The
+jobs in `tasks` and `benchmark_transcode` share them, so the benchmark
+measures exactly what production runs.
+"""
+import os
+
+from django.conf import settings
+
+from .layout import PLAYLIST_NAME, SEGMENT_PATTERN
+
+
+def get_rendition(label):
+    """
+    Returns the configured rendition with the given label.
+    """
+    for rendition in settings.VIDEO_RENDITIONS:
+        if rendition['label'] == label:
+            return rendition
+    raise ValueError(f"Unknown rendition '{label}'.")
+
+
+def ladder_cmd(source, plan, has_audio, target_dir):
+    """
+    Builds the single-decode ffmpeg command for all renditions.
+
+    Remuxed renditions map the source video stream directly and are
+    stream-copied; all others get their own branch of the split filter.
+    ffmpeg expands `%v` to the rendition label, so every variant lands in
+    `<target_dir>/<label>/`.
+    """
+    renditions = [(get_rendition(entry['label']), entry['remux']) for entry in plan]
+    encoded = [i for i, (_, remux) in enumerate(renditions) if not remux]
+
+    cmd = ['ffmpeg', '-y', '-i', source]
+    if encoded:
+        splits = ''.join(f'[s{i}]' for i in encoded)
+        filters = [f'[0:v]split={len(encoded)}{splits}']
+        filters += [f"[s{i}]scale=-2:{renditions[i][0]['height']}[v{i}]" for i in encoded]
+        cmd += ['-filter_complex', ';'.join(filters)]
+
+    stream_map = []
+    for i, (rendition, remux) in enumerate(renditions):
+        cmd += ['-map', '0:v:0' if remux else f'[v{i}]']
+        stream_map.append(f"v:{i},a:{i},name:{rendition['label']}" if has_audio else f"v:{i},name:{rendition['label']}")
+
+    if has_audio:
+        for _ in renditions:
+            cmd += ['-map', '0:a:0']
+
+    for i, (rendition, remux) in enumerate(renditions):
+        cmd += ['-c:v:' + str(i), 'copy'] if remux else _encoder_args(f'{i}') + _bitrate_args(rendition, f'{i}')
+        if has_audio:
+            cmd += _audio_args(rendition, f'{i}')
+
+    cmd += [
+        '-var_stream_map', ' '.join(stream_map),
+        '-hls_segment_filename', os.path.join(target_dir, '%v', SEGMENT_PATTERN),
+    ]
+    cmd += _hls_args()
+    cmd.append(os.path.join(target_dir, '%v', PLAYLIST_NAME))
+    return cmd
+
+
+def rendition_cmd(source, label, remux, target_dir):
+    """
+    Builds the ffmpeg command for one rendition.
+    Generates an .m3u8 playlist file and its segments in `target_dir`.
+    """
+    rendition = get_rendition(label)
+    target = os.path.join(target_dir, PLAYLIST_NAME)
+
+    cmd = ['ffmpeg', '-y', '-i', source]
+    if remux:
+        cmd += ['-c:v', 'copy']
+    else:
+        cmd += ['-vf', f"scale=-2:{rendition['height']}"]
+        cmd += _encoder_args()
+        cmd += _bitrate_args(rendition)
+    cmd += _audio_args(rendition)
+    cmd += _hls_args()
+    cmd += ['-hls_segment_filename', os.path.join(target_dir, SEGMENT_PATTERN)]
+    cmd.append(target)
+    return cmd
+
+
+def chunk_seconds():
+    """
+    Rounds VIDEO_CHUNK_SECONDS to a multiple of the HLS segment duration.
+    """
+    hls_time = settings.VIDEO_HLS_TIME
+    return max(hls_time, round(settings.VIDEO_CHUNK_SECONDS / hls_time) * hls_time)
+
+
+def split_cmd(source, target_dir):
+    """
+    Builds the ffmpeg command cutting the video stream into keyframe-aligned chunks.
+    """
+    return [
+        'ffmpeg', '-y', '-i', source, '-map', '0:v:0', '-c', 'copy', '-f', 'segment',
+        '-segment_time', str(chunk_seconds()), '-reset_timestamps', '1',
+        os.path.join(target_dir, '%04d.mkv'),
+    ]
+
+
+def chunk_cmd(chunk, plan, work_dir, index):
+    """
+    Builds the ffmpeg command encoding one chunk into all renditions.
+
+    Every chunk starts at timestamp 0, so the forced keyframes of all
+    renditions fall on the same positions and the stitched segments align.
+    """
+    renditions = [(get_rendition(entry['label']), entry['remux']) for entry in plan]
+    encoded = [i for i, (_, remux) in enumerate(renditions) if not remux]
+
+    cmd = ['ffmpeg', '-y', '-i', chunk]
+    if encoded:
+        splits = ''.join(f'[s{i}]' for i in encoded)
+        filters = [f'[0:v]split={len(encoded)}{splits}']
+        filters += [f"[s{i}]scale=-2:{renditions[i][0]['height']}[v{i}]" for i in encoded]
+        cmd += ['-filter_complex', ';'.join(filters)]
+
+    for i, (rendition, remux) in enumerate(renditions):
+        if remux:
+            cmd += ['-map', '0:v:0', '-c:v', 'copy']
+        else:
+            cmd += ['-map', f'[v{i}]'] + _encoder_args() + _bitrate_args(rendition)
+        cmd += ['-an', os.path.join(work_dir, rendition['label'], f'{index:04d}.mkv')]
+
+    return cmd
+
+
+def audio_path(work_dir, label):
+    """
+    Returns the path of the audio track `audio_cmd` encodes for a rendition.
+    """
+    return os.path.join(work_dir, f"audio_{get_rendition(label)['audio_bitrate']}.m4a")
+
+
+def audio_cmd(source, plan, work_dir):
+    """
+    Builds the ffmpeg command encoding the source audio once per distinct rendition audio bitrate.
+    """
+    bitrates = sorted({get_rendition(entry['label'])['audio_bitrate'] for entry in plan})
+
+    cmd = ['ffmpeg', '-y', '-i', source]
+    for bitrate in bitrates:
+        cmd += ['-map', '0:a:0', '-vn', '-c:a', 'aac', '-b:a', bitrate, os.path.join(work_dir, f'audio_{bitrate}.m4a')]
+    return cmd
+
+
+def stitch_cmd(list_path, audio, target_dir):
+    """
+    Builds the ffmpeg command joining the chunks of one rendition into HLS.
+    """
+    cmd = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', list_path]
+    if audio:
+        cmd += ['-i', audio, '-map', '0:v:0', '-map', '1:a:0']
+    cmd += ['-c', 'copy']
+    cmd += _hls_args()
+    cmd += ['-hls_segment_filename', os.path.join(target_dir, SEGMENT_PATTERN)]
+    cmd.append(os.path.join(target_dir, PLAYLIST_NAME))
+    return cmd
+
+
+def write_chunk_list(list_path, work_dir, label, count):
+    """
+    Writes the concat list `stitch_cmd` reads for the chunks of one rendition.
+    """
+    with open(list_path, 'w') as f:
+        for index in range(count):
+            f.write(f"file '{os.path.join(work_dir, label, f'{index:04d}.mkv')}'\n")
+
+
+def _encoder_args(stream=None):
+    """
+    Encoder settings for one re-encoded video stream.
+
+    Preset and CRF come from VIDEO_X264_PRESET / VIDEO_X264_CRF. Keyframes are
+    forced on segment boundaries so the segments of all renditions line up
+    and players can switch between them.
+    """
+    video = f':v:{stream}' if stream is not None else ':v'
+    hls_time = settings.VIDEO_HLS_TIME
+    return [
+        f'-c{video}', 'libx264', f'-preset{video}', settings.VIDEO_X264_PRESET,
+        f'-crf{video}', str(settings.VIDEO_X264_CRF), f'-sc_threshold{video}', '0',
+        f'-force_key_frames{video}', f'expr:gte(t,n_forced*{hls_time})',
+    ]
+
+
+def _bitrate_args(rendition, stream=None):
+    """
+    Caps the video bitrate of one rendition so the master playlist can announce it.
+    """
+    video = f':v:{stream}' if stream is not None else ':v'
+    return [
+        f'-maxrate{video}', rendition['video_bitrate'],
+        f'-bufsize{video}', rendition['buffer_size'],
+    ]
+
+
+def _audio_args(rendition, stream=None):
+    """
+    AAC settings for the audio stream of one rendition.
+    """
+    audio = f':a:{stream}' if stream is not None else ':a'
+    return [f'-c{audio}', 'aac', f'-b{audio}', rendition['audio_bitrate']]
+
+
+def _hls_args():
+    """
+    Muxer settings shared by all HLS outputs.
+    """
+    return [
+        '-start_number', '0', '-hls_time', str(settings.VIDEO_HLS_TIME),
+        '-hls_list_size', '0', '-hls_playlist_type', 'vod', '-f', 'hls',
+    ]
@@ -0,0 +1,128 @@
+import os
+import re
+
+from django.conf import settings
+
+# Rendition labels and segment names are taken from the URL, so only plain
+# file names are accepted before they are joined onto a directory.
+LABEL_RE = re.compile(r'^[\w-]+$')
+SEGMENT_RE = re.compile(r'^[\w-]+\.ts$')
+
+PLAYLIST_NAME = 'index.m3u8'
+SEGMENT_PATTERN = '%03d.ts'
+
+
+def output_dir(video_id):
+    """
+    Returns the directory holding all HLS outputs of a video.
+
+    Videos are spread over 256 shard directories by id
+    (`MEDIA_ROOT/hls/<id % 256 as hex>/<id>/`), so no directory ever grows
+    beyond a few hundred entries.
+    """
+    return os.path.join(settings.MEDIA_ROOT, settings.VIDEO_HLS_DIR, f'{int(video_id) % 256:02x}', str(video_id))
+
+
+def asset_dir(content_hash):
+    """
+    Returns the content-addressed directory holding the outputs of a media asset.
+    """
+    return os.path.join(settings.MEDIA_ROOT, settings.VIDEO_HLS_DIR, 'cas', content_hash[:2], content_hash)
+
+
+def link_output(video_id, content_hash):
+    """
+    Points the output directory of a video at the directory of its media asset.
+
+    The link is relative, so it survives moving MEDIA_ROOT. Returns False if
+    the video already has a real output directory (e.g. from before
+    deduplication), which is then left untouched.
+    """
+    target = asset_dir(content_hash)
+    link = output_dir(video_id)
+    os.makedirs(target, exist_ok=True)
+    os.makedirs(os.path.dirname(link), exist_ok=True)
+
+    if os.path.islink(link):
+        os.unlink(link)
+    elif os.path.exists(link):
+        return False
+
+    os.symlink(os.path.relpath(target, os.path.dirname(link)), link)
+    return True
+
+
+def rendition_dir(video_id, label):
+    """
+    Returns the directory holding the playlist and segments of one rendition.
+    """
+    return os.path.join(output_dir(video_id), label)
+
+
+def playlist_path(video_id, label):
+    """
+    Returns the path of the variant playlist of a rendition in the sharded layout.
+    """
+    return os.path.join(rendition_dir(video_id, label), PLAYLIST_NAME)
+
+
+def segment_path(video_id, label, segment):
+    """
+    Returns the path of one segment in the sharded layout, or None for invalid names.
+    """
+    if not LABEL_RE.match(label) or not SEGMENT_RE.match(segment):
+        return None
+    return os.path.join(rendition_dir(video_id, label), segment)
+
+
+def legacy_playlist_path(video, label):
+    """
+    Returns the path of a variant playlist in the old flat layout next to the source.
+    """
+    base, _ = os.path.splitext(video.video_file.path)
+    return f'{base}_{label}.m3u8'
+
+
+def legacy_segment_path(segment, label, video=None):
+    """
+    Returns the path of a segment in the old flat layout, or None for invalid names.
+
+    Flat segments are named `<source>_<label>...ts`; when the video is known the
+    name must carry its prefix, so one video's URL cannot reach another's files.
+    Signed requests skip the lookup because the signature already binds the
+    segment name to the video and rendition.
+    """
+    if not SEGMENT_RE.match(segment):
+        return None
+    if video is not None:
+        base, _ = os.path.splitext(os.path.basename(video.video_file.name))
+        if not segment.startswith(f'{base}_{label}'):
+            return None
+    return os.path.join(settings.MEDIA_ROOT, 'videos', segment)
+
+
+def resolve_playlist(video, label):
+    """
+    Returns the playlist path of a rendition, preferring the sharded layout.
+
+    Outputs that have not been migrated yet are still found in the flat layout,
+    which is what makes `migrate_hls_layout` safe to run on a live system.
+    """
+    if not LABEL_RE.match(label):
+        return None
+    path = playlist_path(video.pk, label)
+    if os.path.exists(path):
+        return path
+    return legacy_playlist_path(video, label)
+
+
+def resolve_segment(video_id, label, segment, video=None):
+    """
+    Returns the segment path of a rendition, preferring the sharded layout.
+    """
+    path = segment_path(video_id, label, segment)
+    if path is None:
+        return None
+    if os.path.exists(path):
+        return path
+    return legacy_segment_path(segment, label, video)
@@ -0,0 +1,168 @@
+"""
+Helpers shared by the benchmark management commands.
+
+They generate synthetic media offline with ffmpeg's lavfi test sources,
+summarize samples and store results as JSON, so runs of the same benchmark
+can be compared to spot regressions.
+"""
+import json
+import math
+import os
+import platform
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+
+def percentile(values, pct):
+    """
+    Returns the pct-th percentile of a list of numbers (nearest-rank), or None if it is empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def frame_size(height):
+    """
+    Returns the 16:9 width x height of a test clip with an even width.
+    """
+    return round(height * 16 / 9 / 2) * 2, height
+
+
+def make_test_clip(path, duration, height, rate=25, audio=True):
+    """
+    Renders a synthetic H.264/AAC source clip with lavfi test sources.
+
+    `testsrc2` has moving content and fine detail, so encoders have real work
+    to do and quality scores are meaningful.
+    """
+    width, height = frame_size(height)
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate={rate}']
+    if audio:
+        cmd += ['-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000']
+    cmd += ['-t', str(duration), '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18', '-pix_fmt', 'yuv420p']
+    if audio:
+        cmd += ['-c:a', 'aac', '-b:a', '128k', '-shortest']
+    cmd.append(path)
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def make_hls_fixture(target_dir, duration, height, hls_time):
+    """
+    Renders a synthetic HLS rendition (index.m3u8 plus segments) into target_dir.
+    """
+    width, height = frame_size(height)
+    os.makedirs(target_dir, exist_ok=True)
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate=25',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000',
+        '-t', str(duration), '-c:v', 'libx264', '-preset', 'ultrafast', '-g', str(25 * hls_time),
+        '-c:a', 'aac', '-b:a', '128k', '-shortest',
+        '-start_number', '0', '-hls_time', str(hls_time), '-hls_list_size', '0',
+        '-hls_playlist_type', 'vod', '-f', 'hls',
+        '-hls_segment_filename', os.path.join(target_dir, '%03d.ts'),
+        os.path.join(target_dir, 'index.m3u8'),
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def git_revision():
+    """
+    Returns the current git commit of the project, or an empty string outside a checkout.
+    """
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True
+        )
+    except OSError:
+        return ''
+    return result.stdout.strip()
+
+
+def build_report(benchmark, options, results):
+    """
+    Wraps benchmark results with the metadata needed to compare runs later.
+    """
+    return {
+        'benchmark': benchmark,
+        'created_at': timezone.now().isoformat(),
+        'revision': git_revision(),
+        'environment': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'options': options,
+        'results': results,
+    }
+
+
+def save_report(path, report):
+    """
+    Writes a report as JSON, creating the parent directory if needed.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load_report(path):
+    """
+    Reads a report written by `save_report`.
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_reports(current, baseline, metrics, threshold):
+    """
+    Compares the results of two reports of the same benchmark.
+
+    `metrics` maps metric names to True if higher values are better. Returns
+    (name, metric, baseline, current, change in percent, regressed) rows for
+    every result and metric present in both reports; a change counts as a
+    regression when it is worse than `threshold` percent.
+    """
+    rows = []
+    for name, values in current['results'].items():
+        base_values = baseline['results'].get(name)
+        if not base_values:
+            continue
+        for metric, higher_is_better in metrics.items():
+            new, old = values.get(metric), base_values.get(metric)
+            if new is None or not old:
+                continue
+            change = (new - old) / old * 100
+            regressed = -change > threshold if higher_is_better else change > threshold
+            rows.append((name, metric, old, new, change, regressed))
+    return rows
+
+
+def print_comparison(command, report, baseline, metrics, threshold, name_width):
+    """
+    Writes the comparison of a report with a baseline to a command's stdout.
+
+    Raises CommandError if any metric regressed by more than `threshold` percent.
+    """
+    rows = compare_reports(report, baseline, metrics, threshold)
+    command.stdout.write(f"\nCompared with {baseline.get('revision') or 'baseline'} ({baseline['created_at']}):")
+    if baseline.get('options') != report['options']:
+        command.stdout.write(command.style.WARNING("The baseline was run with different options."))
+
+    regressions = 0
+    for name, metric, old, new, change, regressed in rows:
+        marker = command.style.ERROR('REGRESSION') if regressed else ''
+        regressions += regressed
+        command.stdout.write(f"{name:<{name_width}}{metric:<22}{old:>12}{new:>12}{change:>+9.1f}% {marker}")
+
+    if regressions:
+        raise CommandError(f"{regressions} metrics regressed by more than {threshold}%.")
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+from video_app.api.delivery import serve_file
+
+MODES = ['python', 'sendfile', 'x-accel-redirect']
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the segment delivery modes of `serve_file`.
+
+    Each request is answered by `serve_file` and its body is written to
+    /dev/null the way a WSGI server would send it: through `os.sendfile` when
+    the response carries a file (gunicorn's `wsgi.file_wrapper`), otherwise by
+    iterating the streamed chunks in Python. The result shows how many
+    requests per second one worker can answer in each mode.
+
+    Example usage:
+    python manage.py benchmark_delivery --requests 2000 --size 2097152
+    """
+    help = "Benchmarks req/s of the segment delivery modes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per mode (default: 500)')
+        parser.add_argument('--size', type=int, default=2 * 1024 * 1024, help='Segment size in bytes (default: 2 MiB)')
+        parser.add_argument('--modes', default=','.join(MODES), help='Comma-separated delivery modes to compare')
+
+    def handle(self, *args, **options):
+        os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+        factory = RequestFactory()
+        modes = [mode.strip() for mode in options['modes'].split(',')]
+
+        with tempfile.TemporaryDirectory(dir=settings.MEDIA_ROOT) as tmp_dir:
+            path = os.path.join(tmp_dir, 'segment.ts')
+            with open(path, 'wb') as f:
+                f.write(os.urandom(options['size']))
+
+            self.stdout.write(f"{'mode':<18}{'req/s':>12}{'MB/s':>12}{'ms/req':>10}")
+            for mode in modes:
+                with override_settings(VIDEO_DELIVERY_MODE=mode):
+                    elapsed, sent = self._run(factory, path, options['requests'])
+
+                requests_per_second = options['requests'] / elapsed
+                self.stdout.write(
+                    f"{mode:<18}{requests_per_second:>12.1f}{sent / elapsed / 1_000_000:>12.1f}"
+                    f"{elapsed / options['requests'] * 1000:>10.3f}"
+                )
+
+    def _run(self, factory, path, count):
+        sent = 0
+        with open(os.devnull, 'wb') as sink:
+            start = time.perf_counter()
+            for _ in range(count):
+                response = serve_file(factory.get('/segment.ts'), path, 'video/MP2T')
+                sent += self._send(response, sink)
+                response.close()
+            return time.perf_counter() - start, sent
+
+    def _send(self, response, sink):
+        """
+        Writes the response body to the sink like a WSGI server would.
+        """
+        file_to_stream = getattr(response, 'file_to_stream', None)
+        if file_to_stream is not None:
+            fileno = file_to_stream.fileno()
+            offset = os.lseek(fileno, 0, os.SEEK_CUR)
+            length = int(response['Content-Length'])
+            sent = 0
+            while sent < length:
+                count = os.sendfile(sink.fileno(), fileno, offset + sent, length - sent)
+                if count == 0:
+                    break
+                sent += count
+            return sent
+
+        sent = 0
+        for chunk in response:
+            sink.write(chunk)
+            sent += len(chunk)
+        return sent
@@ -0,0 +1,321 @@
+import http.client
+import random
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from rest_framework_simplejwt.tokens import AccessToken
+
+from video_app.catalogue import bump_catalogue_version
+from video_app.layout import rendition_dir
+from video_app.models import Video
+from video_app.renditions import register_renditions
+
+from ..benchmarking import (
+    build_report, load_report, make_hls_fixture, percentile, print_comparison, save_report,
+)
+
+ENDPOINTS = ['list', 'master', 'playlist', 'segment']
+OK_STATUSES = (200, 206)
+
+# Metrics compared against a baseline, mapped to whether higher is better.
+METRICS = {'requests_per_second': True, 'p50_ms': False, 'p95_ms': False, 'p99_ms': False, 'queries_per_request': False}
+
+BENCHMARK_EMAIL = 'benchmark@videoflix.local'
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """
+    Request handler of the embedded server that does not log every request.
+    """
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    """
+    Load-tests the catalogue, playlist and segment endpoints with concurrent viewers.
+
+    Synthetic HLS fixtures are rendered offline with ffmpeg's lavfi sources and
+    registered as videos. Each simulated viewer then behaves like a player:
+    it loads the catalogue, the master playlist and a variant playlist and
+    downloads the segments in order over a keep-alive connection.
+
+    By default the requests go to an embedded threaded WSGI server, which also
+    counts database queries per request; `--url` targets a running server
+    (e.g. gunicorn) sharing the same database and media volume instead.
+    Results can be written to JSON and compared with an earlier run.
+
+    Example usage:
+    python manage.py benchmark_streaming --viewers 50 --duration 30 --output bench/streaming.json
+    python manage.py benchmark_streaming --compare bench/streaming.json --threshold 10
+    """
+    help = "Benchmarks req/s, latency percentiles, bytes/s and queries per request of the streaming endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--viewers', type=int, default=20, help='Concurrent simulated viewers (default: 20)')
+        parser.add_argument('--duration', type=float, default=20, help='Seconds to run the load (default: 20)')
+        parser.add_argument('--videos', type=int, default=3, help='Number of fixture videos (default: 3)')
+        parser.add_argument('--fixture-seconds', type=int, default=30, help='Length of each fixture (default: 30)')
+        parser.add_argument('--url', help='Base URL of a running server instead of the embedded one')
+        parser.add_argument('--output', help='Write the results as JSON to this path')
+        parser.add_argument('--compare', help='Compare with the JSON results of an earlier run')
+        parser.add_argument('--threshold', type=float, default=10, help='Regression threshold in percent (default: 10)')
+        parser.add_argument('--keep-fixtures', action='store_true', help='Do not delete the fixture videos afterwards')
+
+    def handle(self, *args, **options):
+        user = self._benchmark_user()
+        videos = self._create_fixtures(options['videos'], options['fixture_seconds'])
+        server = None
+
+        try:
+            if options['url']:
+                base_url = options['url'].rstrip('/')
+            else:
+                server = self._start_server()
+                base_url = f'http://127.0.0.1:{server.server_port}'
+
+            self.stdout.write(
+                f"Running {options['viewers']} viewers for {options['duration']}s against {base_url} ..."
+            )
+            samples, elapsed = self._run_load(base_url, str(AccessToken.for_user(user)), videos, options)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            if not options['keep_fixtures']:
+                for video in videos:
+                    video.delete()
+
+        results = {endpoint: self._summarize(samples[endpoint], elapsed) for endpoint in ENDPOINTS}
+        self._print_results(results)
+
+        report = build_report('streaming', {
+            'viewers': options['viewers'],
+            'duration': options['duration'],
+            'videos': options['videos'],
+            'fixture_seconds': options['fixture_seconds'],
+            'server': 'external' if options['url'] else 'embedded',
+            'delivery_mode': settings.VIDEO_DELIVERY_MODE,
+            'signed_urls': settings.VIDEO_SIGNED_URLS,
+        }, results)
+
+        if options['output']:
+            save_report(options['output'], report)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['compare']:
+            print_comparison(self, report, load_report(options['compare']), METRICS, options['threshold'], 10)
+
+    def _benchmark_user(self):
+        """
+        Returns an active user the simulated viewers authenticate as.
+        """
+        user, created = get_user_model().objects.get_or_create(
+            email=BENCHMARK_EMAIL, defaults={'username': BENCHMARK_EMAIL, 'is_active': True}
+        )
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=['password'])
+        return user
+
+    def _create_fixtures(self, count, duration):
+        """
+        Renders the HLS renditions of `count` synthetic videos.
+
+        The rows are created with bulk_create, so no ingest or transcode job is
+        triggered by the post_save signal.
+        """
+        videos = Video.objects.bulk_create([
+            Video(title=f'Benchmark {i + 1}', description='Synthetic benchmark fixture.',
+                  video_file=f'videos/benchmark_{i + 1}.mp4', thumbnail='')
+            for i in range(count)
+        ])
+        labels = [rendition['label'] for rendition in settings.VIDEO_RENDITIONS]
+
+        for video in videos:
+            self.stdout.write(f"Rendering fixture {video.pk} ({', '.join(labels)}) ...")
+            for rendition in settings.VIDEO_RENDITIONS:
+                target_dir = rendition_dir(video.pk, rendition['label'])
+                make_hls_fixture(target_dir, duration, rendition['height'], settings.VIDEO_HLS_TIME)
+            register_renditions(video, labels)
+
+        bump_catalogue_version()
+        return videos
+
+    def _start_server(self):
+        """
+        Starts a threaded WSGI server on a free local port that counts queries per request.
+        """
+        application = get_wsgi_application()
+
+        def counting_application(environ, start_response):
+            queries = []
+
+            def count(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            def counting_start_response(status, headers, exc_info=None):
+                headers.append(('X-Benchmark-Queries', str(len(queries))))
+                return start_response(status, headers, exc_info)
+
+            with connection.execute_wrapper(count):
+                return application(environ, counting_start_response)
+
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=True)
+        server.set_app(counting_application)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def _run_load(self, base_url, token, videos, options):
+        """
+        Runs the viewers until the deadline and returns the samples per endpoint and the elapsed time.
+        """
+        samples = {endpoint: [] for endpoint in ENDPOINTS}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def viewer(seed):
+            rng = random.Random(seed)
+            client = ViewerClient(base_url, token)
+            try:
+                while time.monotonic() < deadline:
+                    for endpoint, sample in client.watch(rng.choice(videos), rng, deadline):
+                        with lock:
+                            samples[endpoint].append(sample)
+            finally:
+                client.close()
+
+        threads = [threading.Thread(target=viewer, args=(seed,)) for seed in range(options['viewers'])]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.monotonic() - start
+
+    def _summarize(self, samples, elapsed):
+        """
+        Aggregates (status, seconds, bytes, queries) samples of one endpoint.
+
+        Only 200 and 206 responses are measured; anything else (including
+        redirects) counts as an error, so a misrouted request cannot pass for
+        a fast one.
+        """
+        served = [sample for sample in samples if sample[0] in OK_STATUSES]
+        latencies = [seconds * 1000 for _, seconds, _, _ in served]
+        queries = [count for _, _, _, count in served if count is not None]
+        transferred = sum(size for _, _, size, _ in served)
+
+        return {
+            'requests': len(samples),
+            'errors': len(samples) - len(served),
+            'requests_per_second': round(len(served) / elapsed, 1) if elapsed else None,
+            'p50_ms': _round(percentile(latencies, 50)),
+            'p95_ms': _round(percentile(latencies, 95)),
+            'p99_ms': _round(percentile(latencies, 99)),
+            'bytes_per_second': round(transferred / elapsed) if elapsed else None,
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+
+    def _print_results(self, results):
+        self.stdout.write(
+            f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'MB/s':>10}{'queries':>9}"
+        )
+        for endpoint, result in results.items():
+            queries = result['queries_per_request']
+            self.stdout.write(
+                f"{endpoint:<10}{result['requests']:>10}{result['errors']:>8}"
+                f"{_format(result['requests_per_second'])}{_format(result['p50_ms'])}"
+                f"{_format(result['p95_ms'])}{_format(result['p99_ms'])}"
+                f"{(result['bytes_per_second'] or 0) / 1_000_000:>10.1f}"
+                f"{queries if queries is not None else '-':>9}"
+            )
+
+
+class ViewerClient:
+    """
+    Minimal HLS player that keeps one HTTP/1.1 connection to the server.
+    """
+    def __init__(self, base_url, token):
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        self.prefix = parts.path.rstrip('/')
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.netloc, timeout=30)
+        self.headers = {'Cookie': f'access_token={token}'}
+
+    def watch(self, video, rng, deadline):
+        """
+        Yields (endpoint, sample) tuples for one viewing session of a video.
+        """
+        *_, sample = self.get('/api/video/')
+        yield 'list', sample
+
+        master_url = f'/api/video/{video.pk}/master.m3u8'
+        status, _, body, sample = self.get(master_url)
+        yield 'master', sample
+        variants = [line for line in body.decode().splitlines() if line and not line.startswith('#')]
+        if status != 200 or not variants:
+            return
+
+        playlist_url = urljoin(master_url, rng.choice(variants))
+        status, _, body, sample = self.get(playlist_url)
+        yield 'playlist', sample
+        segments = [line for line in body.decode().splitlines() if line and not line.startswith('#')]
+
+        for segment in segments:
+            if time.monotonic() >= deadline:
+                return
+            *_, sample = self.get(_segment_url(playlist_url, segment))
+            yield 'segment', sample
+
+    def get(self, path):
+        """
+        Performs one GET and returns (status, headers, body, sample).
+        """
+        start = time.perf_counter()
+        try:
+            self.connection.request('GET', self.prefix + path, headers=self.headers)
+            response = self.connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            return 599, {}, b'', (599, time.perf_counter() - start, 0, None)
+
+        elapsed = time.perf_counter() - start
+        queries = response.getheader('X-Benchmark-Queries')
+        sample = (response.status, elapsed, len(body), int(queries) if queries is not None else None)
+        return response.status, response.headers, body, sample
+
+    def close(self):
+        self.connection.close()
+
+
+def _segment_url(playlist_url, segment):
+    """
+    Resolves a segment URI of a playlist to the segment endpoint, which ends in a slash.
+
+    Unsigned playlists list bare file names (`000.ts`), signed ones already
+    point at `<segment>/?exp=...`.
+    """
+    path, _, query = urljoin(playlist_url, segment).partition('?')
+    if not path.endswith('/'):
+        path += '/'
+    return f'{path}?{query}' if query else path
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def _format(value):
+    return f"{value:>10.1f}" if value is not None else f"{'-':>10}"
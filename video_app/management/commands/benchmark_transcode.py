@@ -0,0 +1,253 @@
+import glob
+import itertools
+import os
+import re
+import resource
+import subprocess
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from video_app.encoding import (
+    audio_cmd, audio_path, chunk_cmd, get_rendition, ladder_cmd, rendition_cmd, split_cmd, stitch_cmd,
+    write_chunk_list,
+)
+from video_app.probe import probe_media
+from video_app.renditions import plan_renditions
+from video_app.scheduler import progress_cmd
+
+from ..benchmarking import build_report, frame_size, load_report, make_test_clip, print_comparison, save_report
+
+MODES = ['ladder', 'per_rendition', 'chunked']
+
+# Metrics compared against a baseline, mapped to whether higher is better.
+METRICS = {'encode_fps': True, 'cpu_seconds': False, 'output_bytes': False, 'psnr': True, 'ssim': True}
+
+PSNR_RE = re.compile(r'PSNR .*average:([\d.]+|inf)')
+SSIM_RE = re.compile(r'SSIM .*All:([\d.]+)')
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the transcode pipeline across a matrix of x264 settings.
+
+    A synthetic source clip is rendered with lavfi test sources at the height
+    of the largest configured rendition and planned like an upload
+    (`plan_renditions`). Every combination of preset, CRF, HLS segment
+    duration and thread count is then transcoded the way VIDEO_TRANSCODE_MODE
+    (or --mode) does it in production, with the same command builders
+    (`video_app.encoding`) and ffmpeg options (`scheduler.progress_cmd`). The
+    steps of a chunked transcode run one after another, as on a single worker.
+
+    For each run the command records wall time, encode fps (source frames per
+    second of wall time), CPU seconds (from the ffmpeg processes' rusage),
+    output bytes and combined bitrate of all renditions, and scores one
+    rendition against the source with PSNR and SSIM.
+
+    Example usage:
+    python manage.py benchmark_transcode --presets veryfast,medium --crf 21,23,26 --output bench/transcode.json
+    python manage.py benchmark_transcode --mode per_rendition --compare bench/transcode.json
+    """
+    help = "Benchmarks encode speed, CPU time, size and quality of the transcode pipeline across x264 settings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=MODES, default=settings.VIDEO_TRANSCODE_MODE,
+                            help='Transcode mode to run (default: VIDEO_TRANSCODE_MODE)')
+        parser.add_argument('--presets', default=settings.VIDEO_X264_PRESET, help='Comma-separated x264 presets')
+        parser.add_argument('--crf', default=str(settings.VIDEO_X264_CRF), help='Comma-separated CRF values')
+        parser.add_argument('--hls-time', default=str(settings.VIDEO_HLS_TIME), help='Comma-separated segment durations')
+        parser.add_argument('--threads', default=str(settings.VIDEO_TRANSCODE_THREADS),
+                            help='Comma-separated ffmpeg thread counts (0 = auto, default: VIDEO_TRANSCODE_THREADS)')
+        parser.add_argument('--chunk-seconds', type=int, default=settings.VIDEO_CHUNK_SECONDS,
+                            help='Chunk length of the chunked mode (default: VIDEO_CHUNK_SECONDS)')
+        parser.add_argument('--rendition', help='Rendition label to score (default: the largest re-encoded one)')
+        parser.add_argument('--clip-seconds', type=int, default=20, help='Length of the test clip (default: 20)')
+        parser.add_argument('--source', help='Use this file instead of a generated test clip')
+        parser.add_argument('--no-quality', action='store_true', help='Skip the PSNR/SSIM measurement')
+        parser.add_argument('--output', help='Write the results as JSON to this path')
+        parser.add_argument('--compare', help='Compare with the JSON results of an earlier run')
+        parser.add_argument('--threshold', type=float, default=5, help='Regression threshold in percent (default: 5)')
+
+    def handle(self, *args, **options):
+        mode = options['mode']
+        if mode not in MODES:
+            raise CommandError(f"Unknown transcode mode '{mode}'.")
+        matrix = list(itertools.product(
+            _split(options['presets']), _split(options['crf'], int),
+            _split(options['hls_time'], int), _split(options['threads'], int),
+        ))
+
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source = options['source']
+            if not source:
+                height = max(rendition['height'] for rendition in settings.VIDEO_RENDITIONS)
+                source = os.path.join(tmp_dir, 'source.mp4')
+                self.stdout.write(f"Rendering {options['clip_seconds']}s test clip at {height}p ...")
+                make_test_clip(source, options['clip_seconds'], height)
+
+            metadata = probe_media(source)
+            if metadata is None:
+                raise CommandError(f"ffprobe cannot read {source}.")
+            plan = plan_renditions(metadata)
+            rendition = self._scored_rendition(plan, options['rendition'])
+            frames = (metadata['duration'] or 0) * (metadata['frame_rate'] or 0)
+
+            self.stdout.write(
+                f"Mode {mode}: " + ', '.join(
+                    entry['label'] + (' (remux)' if entry['remux'] else '') for entry in plan
+                ) + f"; scoring {rendition['label']}"
+            )
+            self.stdout.write(
+                f"{'preset':<11}{'crf':>4}{'hls':>5}{'thr':>5}{'wall s':>9}{'fps':>8}{'cpu s':>9}"
+                f"{'kbit/s':>9}{'MB':>8}{'psnr':>8}{'ssim':>8}"
+            )
+            for preset, crf, hls_time, threads in matrix:
+                target_dir = os.path.join(tmp_dir, f'{preset}-{crf}-{hls_time}-{threads}')
+                os.makedirs(target_dir)
+                with override_settings(
+                    VIDEO_X264_PRESET=preset, VIDEO_X264_CRF=crf, VIDEO_HLS_TIME=hls_time,
+                    VIDEO_CHUNK_SECONDS=options['chunk_seconds'],
+                ):
+                    commands = _commands(mode, source, plan, bool(metadata['audio_codec']), target_dir)
+                    result = self._run(commands, target_dir, threads)
+                result['encode_fps'] = round(frames / result['wall_seconds'], 1) if result['wall_seconds'] else None
+                result['bitrate_kbps'] = (
+                    round(result['output_bytes'] * 8 / metadata['duration'] / 1000) if metadata['duration'] else None
+                )
+                if not options['no_quality']:
+                    result.update(self._quality(source, os.path.join(target_dir, rendition['label']), rendition))
+
+                results[f'preset={preset} crf={crf} hls_time={hls_time} threads={threads}'] = result
+                self._print_row(preset, crf, hls_time, threads, result)
+
+        report = build_report('transcode', {
+            'mode': mode,
+            'plan': plan,
+            'rendition': rendition['label'],
+            'chunk_seconds': options['chunk_seconds'] if mode == 'chunked' else None,
+            'clip_seconds': options['clip_seconds'],
+            'source': options['source'] or 'testsrc2',
+        }, results)
+
+        if options['output']:
+            save_report(options['output'], report)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['compare']:
+            print_comparison(self, report, load_report(options['compare']), METRICS, options['threshold'], 50)
+
+    def _scored_rendition(self, plan, label):
+        """
+        Returns the rendition scored for quality: the given one, or the largest re-encoded one of the plan.
+        """
+        if label:
+            if label not in [entry['label'] for entry in plan]:
+                raise CommandError(f"Rendition '{label}' is not planned for this source.")
+            return get_rendition(label)
+        encoded = [get_rendition(entry['label']) for entry in plan if not entry['remux']]
+        candidates = encoded or [get_rendition(entry['label']) for entry in plan]
+        return max(candidates, key=lambda rendition: rendition['height'])
+
+    def _run(self, commands, target_dir, threads):
+        """
+        Runs the ffmpeg commands of one configuration and measures wall time, CPU time and output size.
+        """
+        wall = cpu = 0
+        for cmd in commands:
+            # ffmpeg is the only child running meanwhile, so the delta of the children's rusage is its CPU time.
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            start = time.perf_counter()
+            result = subprocess.run(progress_cmd(cmd, threads), capture_output=True, text=True)
+            wall += time.perf_counter() - start
+            after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            if result.returncode != 0:
+                raise CommandError(f"ffmpeg failed: {result.stderr[-1000:]}")
+            cpu += (after.ru_utime - usage.ru_utime) + (after.ru_stime - usage.ru_stime)
+
+        size = sum(os.path.getsize(path) for path in glob.glob(os.path.join(target_dir, '*', '*.ts')))
+        return {
+            'wall_seconds': round(wall, 2),
+            'cpu_seconds': round(cpu, 2),
+            'output_bytes': size,
+        }
+
+    def _quality(self, source, rendition_dir, rendition):
+        """
+        Scores the encoded rendition against the source scaled to the same size with PSNR and SSIM.
+        """
+        width, height = frame_size(rendition['height'])
+        filters = (
+            f'[1:v]scale={width}:{height}:flags=bicubic,split[ref1][ref2];'
+            f'[0:v]scale={width}:{height},split[out1][out2];'
+            '[out1][ref1]psnr;[out2][ref2]ssim'
+        )
+        cmd = [
+            'ffmpeg', '-nostats', '-i', os.path.join(rendition_dir, 'index.m3u8'), '-i', source,
+            '-lavfi', filters, '-f', 'null', '-'
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+
+        psnr = PSNR_RE.search(result.stderr)
+        ssim = SSIM_RE.search(result.stderr)
+        return {
+            'psnr': float(psnr.group(1)) if psnr and psnr.group(1) != 'inf' else None,
+            'ssim': float(ssim.group(1)) if ssim else None,
+        }
+
+    def _print_row(self, preset, crf, hls_time, threads, result):
+        self.stdout.write(
+            f"{preset:<11}{crf:>4}{hls_time:>5}{threads:>5}{result['wall_seconds']:>9.2f}"
+            f"{_format(result['encode_fps'], 8, 1)}{_format(result['cpu_seconds'], 9, 2)}"
+            f"{_format(result['bitrate_kbps'], 9, 0)}{result['output_bytes'] / 1_000_000:>8.2f}"
+            f"{_format(result.get('psnr'), 8, 2)}{_format(result.get('ssim'), 8, 4)}"
+        )
+
+
+def _commands(mode, source, plan, has_audio, target_dir):
+    """
+    Yields the ffmpeg commands of one transcode in the given mode, writing the renditions to `<target_dir>/<label>/`.
+
+    This is a generator because the chunked mode only knows the number of
+    chunks after the split command has run.
+    """
+    for entry in plan:
+        os.makedirs(os.path.join(target_dir, entry['label']), exist_ok=True)
+
+    if mode == 'ladder':
+        yield ladder_cmd(source, plan, has_audio, target_dir)
+        return
+
+    if mode == 'per_rendition':
+        for entry in plan:
+            yield rendition_cmd(source, entry['label'], entry['remux'], os.path.join(target_dir, entry['label']))
+        return
+
+    work_dir = os.path.join(target_dir, 'chunks')
+    os.makedirs(os.path.join(work_dir, 'source'))
+    for entry in plan:
+        os.makedirs(os.path.join(work_dir, entry['label']))
+
+    yield split_cmd(source, os.path.join(work_dir, 'source'))
+    count = len(glob.glob(os.path.join(work_dir, 'source', '*.mkv')))
+    for index in range(count):
+        yield chunk_cmd(os.path.join(work_dir, 'source', f'{index:04d}.mkv'), plan, work_dir, index)
+    if has_audio:
+        yield audio_cmd(source, plan, work_dir)
+
+    for entry in plan:
+        list_path = os.path.join(work_dir, f"{entry['label']}.txt")
+        write_chunk_list(list_path, work_dir, entry['label'], count)
+        audio = audio_path(work_dir, entry['label']) if has_audio else None
+        yield stitch_cmd(list_path, audio, os.path.join(target_dir, entry['label']))
+
+
+def _split(value, cast=str):
+    return [cast(item.strip()) for item in str(value).split(',') if item.strip()]
+
+
+def _format(value, width, digits):
+    return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
@@ -0,0 +1,96 @@
+import glob
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+
+from video_app.layout import LABEL_RE, legacy_playlist_path, playlist_path, rendition_dir
+from video_app.models import Video
+from video_app.renditions import parse_playlist
+
+
+class Command(BaseCommand):
+    """
+    Moves HLS outputs from the flat `media/videos` directory into the sharded layout.
+
+    The migration is safe while the site is serving: segments are hard-linked
+    (or copied across filesystems) into the rendition directory first, and the
+    playlist is placed last with an atomic rename. Until that rename the views
+    keep resolving the rendition in the flat layout. Segment names are kept, so
+    signed URLs handed out before the migration stay valid.
+
+    Example usage:
+    python manage.py migrate_hls_layout
+    python manage.py migrate_hls_layout --video 12 --delete-legacy
+    """
+    help = "Moves HLS playlists and segments into the sharded per-video layout"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', type=int, action='append', help='Only migrate this video id (repeatable)')
+        parser.add_argument('--delete-legacy', action='store_true', help='Delete the flat files after migrating')
+        parser.add_argument('--dry-run', action='store_true', help='Only list what would be migrated')
+
+    def handle(self, *args, **options):
+        videos = Video.objects.order_by('pk')
+        if options['video']:
+            videos = videos.filter(pk__in=options['video'])
+
+        migrated = 0
+        for video in videos.iterator():
+            if not video.video_file:
+                continue
+
+            for label, legacy_path in self._legacy_playlists(video):
+                if options['dry_run']:
+                    self.stdout.write(f"{video.pk} {label}: {legacy_path} -> {playlist_path(video.pk, label)}")
+                    continue
+
+                segments = self._migrate_rendition(video, label, legacy_path)
+                migrated += 1
+                self.stdout.write(f"Migrated video {video.pk} {label} ({len(segments)} segments)")
+
+                if options['delete_legacy']:
+                    for segment, _ in segments:
+                        os.remove(segment)
+                    os.remove(legacy_path)
+
+            if options['delete_legacy'] and not options['dry_run']:
+                base, _ = os.path.splitext(video.video_file.path)
+                if os.path.exists(f'{base}_master.m3u8'):
+                    os.remove(f'{base}_master.m3u8')
+
+        self.stdout.write(self.style.SUCCESS(f"Migrated {migrated} renditions."))
+
+    def _legacy_playlists(self, video):
+        """
+        Yields (label, path) for every variant playlist of a video in the flat layout.
+        """
+        base, _ = os.path.splitext(video.video_file.path)
+        for path in sorted(glob.glob(f'{glob.escape(base)}_*.m3u8')):
+            label = path[len(base) + 1:-len('.m3u8')]
+            if label == 'master' or not LABEL_RE.match(label):
+                continue
+            if path == legacy_playlist_path(video, label):
+                yield label, path
+
+    def _migrate_rendition(self, video, label, legacy_path):
+        """
+        Links the segments of one rendition into its new directory, then publishes the playlist.
+        """
+        target_dir = rendition_dir(video.pk, label)
+        os.makedirs(target_dir, exist_ok=True)
+
+        segments = parse_playlist(legacy_path)
+        for segment, _ in segments:
+            target = os.path.join(target_dir, os.path.basename(segment))
+            if os.path.exists(target):
+                continue
+            try:
+                os.link(segment, target)
+            except OSError:
+                shutil.copy2(segment, target)
+
+        tmp_path = os.path.join(target_dir, '.index.m3u8.tmp')
+        shutil.copy2(legacy_path, tmp_path)
+        os.replace(tmp_path, playlist_path(video.pk, label))
+        return segments
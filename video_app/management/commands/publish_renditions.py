@@ -0,0 +1,65 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from video_app.layout import playlist_path
+from video_app.models import Video
+from video_app.storage import RenditionPublisher, is_remote, rendition_storage
+
+
+class Command(BaseCommand):
+    """
+    Uploads existing HLS outputs and thumbnails from MEDIA_ROOT to the rendition storage.
+
+    Run it with VIDEO_STORAGE=s3 before the web processes switch over. Every
+    rendition is uploaded like a finished transcode (segments first, playlist
+    last), so it is safe while the site is serving and can be repeated.
+    Outputs must be in the sharded layout; run `migrate_hls_layout` first.
+
+    Example usage:
+    python manage.py publish_renditions
+    python manage.py publish_renditions --video 12
+    """
+    help = "Uploads HLS renditions and thumbnails to the configured object storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', type=int, action='append', help='Only publish this video id (repeatable)')
+
+    def handle(self, *args, **options):
+        if not is_remote():
+            raise CommandError("VIDEO_STORAGE is not 's3'; renditions are served from MEDIA_ROOT.")
+
+        videos = Video.objects.order_by('pk').prefetch_related('renditions')
+        if options['video']:
+            videos = videos.filter(pk__in=options['video'])
+
+        published = 0
+        for video in videos:
+            labels = []
+            for rendition in video.renditions.all():
+                if os.path.exists(playlist_path(video.pk, rendition.label)):
+                    labels.append(rendition.label)
+                else:
+                    self.stderr.write(f"Video {video.pk} {rendition.label}: no playlist in the sharded layout, skipped")
+
+            RenditionPublisher(video, labels).publish()
+            published += len(labels)
+
+            thumbnails = {video.thumbnail.name, *video.thumbnail_variants.values()} - {None, ''}
+            for name in sorted(thumbnails):
+                self._publish_file(name)
+            self.stdout.write(f"Published video {video.pk} ({len(labels)} renditions)")
+
+        self.stdout.write(self.style.SUCCESS(f"Published {published} renditions."))
+
+    def _publish_file(self, name):
+        """
+        Uploads one file below MEDIA_ROOT under its own name, unless it is missing locally.
+        """
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        if not os.path.isfile(path):
+            return
+        with open(path, 'rb') as f:
+            rendition_storage().save(name, File(f))
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_app', '0005_video_thumbnail_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Rendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(max_length=20)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('bandwidth', models.PositiveIntegerField(help_text='Peak segment bitrate in bits per second.')),
+                ('average_bandwidth', models.PositiveIntegerField(help_text='Average bitrate in bits per second.')),
+                ('codecs', models.CharField(max_length=100)),
+                ('frame_rate', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='video_app.video')),
+            ],
+            options={
+                'ordering': ['bandwidth'],
+                'constraints': [models.UniqueConstraint(fields=('video', 'label'), name='unique_video_rendition')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:37
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_app', '0008_video_catalogue_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField(help_text='Total size of the upload in bytes.')),
+                ('offset', models.PositiveBigIntegerField(default=0, help_text='Number of bytes received so far.')),
+                ('state', models.CharField(choices=[('active', 'Active'), ('completed', 'Completed'), ('aborted', 'Aborted')], default='active', max_length=20)),
+                ('title', models.CharField(max_length=80)),
+                ('description', models.TextField(max_length=500)),
+                ('category', models.CharField(choices=[('drama', 'Drama'), ('documentary', 'Documentary'), ('romance', 'Romance'), ('comedy', 'Comedy')], default='drama', max_length=50)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+                ('video', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_session', to='video_app.video')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_app', '0009_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transcodejob',
+            name='kind',
+            field=models.CharField(choices=[('ladder', 'Ladder'), ('rendition', 'Single rendition'), ('chunked', 'Chunked ladder')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_app', '0012_watchprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoViewStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rendition', models.CharField(max_length=20)),
+                ('bucket', models.DateTimeField(help_text='Start of the time bucket.')),
+                ('segments', models.PositiveBigIntegerField(default=0, help_text='Segment requests served.')),
+                ('viewers', models.PositiveIntegerField(default=0, help_text='Unique viewers (HyperLogLog estimate).')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='trending_score',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['-trending_score', '-created_at', '-id'], name='video_trending_idx'),
+        ),
+        migrations.AddField(
+            model_name='videoviewstats',
+            name='video',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_stats', to='video_app.video'),
+        ),
+        migrations.AddIndex(
+            model_name='videoviewstats',
+            index=models.Index(fields=['bucket'], name='view_stats_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='videoviewstats',
+            constraint=models.UniqueConstraint(fields=('video', 'rendition', 'bucket'), name='unique_video_rendition_bucket'),
+        ),
+    ]
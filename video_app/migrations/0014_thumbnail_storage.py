@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 04:06
+
+import video_app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_app', '0013_view_stats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='video',
+            name='thumbnail',
+            field=models.FileField(blank=True, null=True, storage=video_app.storage.rendition_storage, upload_to='thumbnails'),
+        ),
+    ]
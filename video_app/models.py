@@ -1,6 +1,28 @@
+import os
+import uuid
+
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from .storage import rendition_storage
+
+class MediaAsset(models.Model):
+    """
+    Model representing transcode outputs shared by all videos with identical sources.
+
+    The renditions of an asset live in a content-addressed directory; each
+    video's output directory is a link to it. `ref_count` is the number of
+    videos using the asset, and the files are removed when it drops to zero.
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.content_hash[:12]} ({self.ref_count} refs)'
+
+
 class Video(models.Model):
     """
     Model representing a video entity with its metadata and associated source files.
@@ -16,8 +38,193 @@ class Video(models.Model):
     description = models.TextField(max_length=500)
     created_at = models.DateTimeField(default=timezone.now)
     video_file = models.FileField(upload_to='videos')
-    thumbnail = models.FileField(upload_to='thumbnails', blank=True, null=True)
+    thumbnail = models.FileField(upload_to='thumbnails', storage=rendition_storage, blank=True, null=True)
+    thumbnail_variants = models.JSONField(default=dict, blank=True)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='drama')
 
+    # Media metadata filled in by the ffprobe ingest stage.
+    duration = models.FloatField(null=True, blank=True, help_text='Duration in seconds.')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    bitrate = models.PositiveIntegerField(null=True, blank=True, help_text='Overall bitrate in bits per second.')
+    frame_rate = models.FloatField(null=True, blank=True)
+    video_codec = models.CharField(max_length=30, blank=True)
+    audio_codec = models.CharField(max_length=30, blank=True)
+
+    # SHA-256 of the source file, computed by the ingest stage.
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    asset = models.ForeignKey(MediaAsset, on_delete=models.SET_NULL, null=True, blank=True, related_name='videos')
+
+    # Unique viewers over the trending window, maintained by the `rollup_view_stats` job.
+    trending_score = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        # Back the keyset pagination of the catalogue (newest first, with and without a
+        # category filter) and the trending order.
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='video_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='video_category_created_idx'),
+            models.Index(fields=['-trending_score', '-created_at', '-id'], name='video_trending_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class TranscodeJob(models.Model):
+    """
+    Model tracking a single ffmpeg transcode run for a video.
+
+    The record is created when the job is enqueued and updated by the worker
+    with the parsed ffmpeg progress and the final exit status.
+    """
+    KIND_LADDER = 'ladder'
+    KIND_RENDITION = 'rendition'
+    KIND_CHUNKED = 'chunked'
+    KIND_CHOICES = [
+        (KIND_LADDER, 'Ladder'),
+        (KIND_RENDITION, 'Single rendition'),
+        (KIND_CHUNKED, 'Chunked ladder'),
+    ]
+
+    STATE_QUEUED = 'queued'
+    STATE_RUNNING = 'running'
+    STATE_FINISHED = 'finished'
+    STATE_FAILED = 'failed'
+    STATE_CHOICES = [
+        (STATE_QUEUED, 'Queued'),
+        (STATE_RUNNING, 'Running'),
+        (STATE_FINISHED, 'Finished'),
+        (STATE_FAILED, 'Failed'),
+    ]
+
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='transcode_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    rendition = models.CharField(max_length=20, blank=True)
+    plan = models.JSONField(default=list, blank=True, help_text='Renditions to produce, e.g. [{"label": "720p", "remux": false}].')
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_QUEUED)
+    progress = models.FloatField(default=0)
+    fps = models.FloatField(null=True, blank=True)
+    exit_status = models.IntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.video} ({self.rendition or self.kind}): {self.state}'
+
+
+class Rendition(models.Model):
+    """
+    Model describing one finished HLS rendition of a video.
+
+    The values are measured from the generated playlist and segments and are
+    used to build the adaptive master playlist.
+    """
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='renditions')
+    label = models.CharField(max_length=20)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    bandwidth = models.PositiveIntegerField(help_text='Peak segment bitrate in bits per second.')
+    average_bandwidth = models.PositiveIntegerField(help_text='Average bitrate in bits per second.')
+    codecs = models.CharField(max_length=100)
+    frame_rate = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['bandwidth']
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'label'], name='unique_video_rendition'),
+        ]
+
+    def __str__(self):
+        return f'{self.video} ({self.label})'
+
+
+class UploadSession(models.Model):
+    """
+    Model tracking a resumable, chunked upload of a source video.
+
+    Chunks are appended to a partial file in VIDEO_UPLOAD_DIR at the current
+    `offset`. The Video row is only created once `offset` reaches `size`.
+    """
+    STATE_ACTIVE = 'active'
+    STATE_COMPLETED = 'completed'
+    STATE_ABORTED = 'aborted'
+    STATE_CHOICES = [
+        (STATE_ACTIVE, 'Active'),
+        (STATE_COMPLETED, 'Completed'),
+        (STATE_ABORTED, 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text='Total size of the upload in bytes.')
+    offset = models.PositiveBigIntegerField(default=0, help_text='Number of bytes received so far.')
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=STATE_ACTIVE)
+    title = models.CharField(max_length=80)
+    description = models.TextField(max_length=500)
+    category = models.CharField(max_length=50, choices=Video.CATEGORY_CHOICES, default='drama')
+    video = models.OneToOneField(Video, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload_session')
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def part_path(self):
+        """
+        Filesystem path of the partial file the chunks are written to.
+        """
+        return os.path.join(settings.VIDEO_UPLOAD_DIR, f'{self.pk}.part')
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size}): {self.state}'
+
+
+class WatchProgress(models.Model):
+    """
+    Model storing how far a user has watched a video, for "continue watching".
+
+    Players report their position to Redis (see `video_app.progress`); rows
+    are only written by the periodic `flush_watch_progress` job, in batched
+    upserts on the (user, video) constraint.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='watch_progress')
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='watch_progress')
+    position = models.FloatField(help_text='Playback position in seconds.')
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'video'], name='unique_user_video_progress'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} @ {self.video}: {self.position:.0f}s'
+
+
+class VideoViewStats(models.Model):
+    """
+    Model storing the segment requests and unique viewers of a video rendition per time bucket.
+
+    Segment views count into Redis (see `video_app.analytics`); the periodic
+    `rollup_view_stats` job upserts the totals of each bucket, so a bucket
+    row is rewritten with growing totals until the bucket is closed.
+    """
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='view_stats')
+    rendition = models.CharField(max_length=20)
+    bucket = models.DateTimeField(help_text='Start of the time bucket.')
+    segments = models.PositiveBigIntegerField(default=0, help_text='Segment requests served.')
+    viewers = models.PositiveIntegerField(default=0, help_text='Unique viewers (HyperLogLog estimate).')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'rendition', 'bucket'], name='unique_video_rendition_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='view_stats_bucket_idx'),
+        ]
+
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return f'{self.video} ({self.rendition}) {self.bucket:%Y-%m-%d %H:%M}: {self.viewers} viewers'
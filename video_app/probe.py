@@ -0,0 +1,91 @@
+import json
+import subprocess
+
+
+def probe_media(source):
+    """
+    Reads container and stream metadata of a media file with ffprobe.
+
+    Returns a dict with duration, overall and video bitrate, resolution,
+    frame rate, pixel format and the video/audio codec names, or None if
+    ffprobe cannot read the file or it has no video stream.
+    """
+    cmd = [
+        'ffprobe', '-v', 'error', '-show_entries',
+        'format=duration,bit_rate:stream=codec_type,codec_name,width,height,avg_frame_rate,pix_fmt,bit_rate',
+        '-of', 'json', source
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    try:
+        data = json.loads(result.stdout)
+    except ValueError:
+        return None
+
+    streams = data.get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+    if video is None:
+        return None
+
+    container = data.get('format', {})
+    bitrate = _to_int(container.get('bit_rate'))
+
+    return {
+        'duration': _to_float(container.get('duration')),
+        'bitrate': bitrate,
+        'video_bitrate': _to_int(video.get('bit_rate')) or bitrate,
+        'width': _to_int(video.get('width')),
+        'height': _to_int(video.get('height')),
+        'frame_rate': parse_frame_rate(video.get('avg_frame_rate')),
+        'pix_fmt': video.get('pix_fmt', ''),
+        'video_codec': video.get('codec_name', ''),
+        'audio_codec': audio.get('codec_name', '') if audio else '',
+    }
+
+
+def parse_frame_rate(value):
+    """
+    Converts ffprobe's `num/den` frame rate into a float.
+    """
+    try:
+        num, den = (int(part) for part in (value or '').split('/'))
+        return num / den if den else None
+    except ValueError:
+        return None
+
+
+def parse_bitrate(value):
+    """
+    Converts an ffmpeg bitrate string such as '2800k' or '5M' into bits per second.
+    """
+    multipliers = {'k': 1_000, 'm': 1_000_000}
+    value = str(value).strip().lower()
+    if value and value[-1] in multipliers:
+        return int(float(value[:-1]) * multipliers[value[-1]])
+    return int(value)
+
+
+def has_audio(source):
+    """
+    Checks with ffprobe whether the source contains at least one audio stream.
+    """
+    cmd = [
+        'ffprobe', '-v', 'error', '-select_streams', 'a',
+        '-show_entries', 'stream=index', '-of', 'csv=p=0', source
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return bool(result.stdout.strip())
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
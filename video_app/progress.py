@@ -0,0 +1,121 @@
+"""
+Write-behind buffer for watch progress.
+
+Player heartbeats only touch Redis: the position is stored in a per-user
+hash (video id -> position and time) and the (user, video) pair is added to
+a set of dirty entries. The `flush_watch_progress` job pops dirty entries in
+batches and upserts them into WatchProgress, so Postgres sees one write per
+active viewer and flush interval instead of one per heartbeat.
+"""
+import json
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django_redis import get_redis_connection
+
+from .models import Video, WatchProgress
+
+DIRTY_KEY = 'progress:dirty'
+
+
+def progress_key(user_id):
+    """
+    Returns the Redis key of the hash holding a user's buffered positions.
+    """
+    return f'progress:user:{user_id}'
+
+
+def record_progress(user_id, video_id, position):
+    """
+    Buffers the playback position of a user for a video.
+    """
+    entry = json.dumps({'position': position, 'at': time.time()})
+    pipeline = get_redis_connection('default').pipeline()
+    pipeline.hset(progress_key(user_id), video_id, entry)
+    pipeline.expire(progress_key(user_id), settings.WATCH_PROGRESS_BUFFER_TTL)
+    pipeline.sadd(DIRTY_KEY, f'{user_id}:{video_id}')
+    pipeline.execute()
+
+
+def get_positions(user_id):
+    """
+    Returns a dict mapping video ids to the user's resume position in seconds.
+
+    Stored rows are read in one query and overlaid with the buffered
+    positions, which are newer than anything not flushed yet.
+    """
+    positions = dict(WatchProgress.objects.filter(user_id=user_id).values_list('video_id', 'position'))
+    buffered = get_redis_connection('default').hgetall(progress_key(user_id))
+    positions.update({int(video_id): json.loads(entry)['position'] for video_id, entry in buffered.items()})
+    return positions
+
+
+def get_position(user_id, video_id):
+    """
+    Returns the user's resume position for one video, or None if it was never reported.
+    """
+    entry = get_redis_connection('default').hget(progress_key(user_id), video_id)
+    if entry is not None:
+        return json.loads(entry)['position']
+    return WatchProgress.objects.filter(user_id=user_id, video_id=video_id).values_list('position', flat=True).first()
+
+
+def flush_progress(batch_size):
+    """
+    Writes buffered positions to WatchProgress in batches of `batch_size`; returns the number of rows written.
+
+    A heartbeat arriving during the flush marks its entry dirty again, so it
+    is picked up by the next run. If the database write fails, the popped
+    entries are marked dirty again before the error is raised.
+    """
+    redis = get_redis_connection('default')
+    written = 0
+
+    while True:
+        members = redis.spop(DIRTY_KEY, batch_size)
+        if not members:
+            return written
+
+        pairs = [tuple(int(part) for part in member.decode().split(':')) for member in members]
+        pipeline = redis.pipeline(transaction=False)
+        for user_id, video_id in pairs:
+            pipeline.hget(progress_key(user_id), video_id)
+        entries = {pair: json.loads(entry) for pair, entry in zip(pairs, pipeline.execute()) if entry is not None}
+
+        try:
+            written += _save_entries(entries)
+        except DatabaseError:
+            redis.sadd(DIRTY_KEY, *members)
+            raise
+
+        if len(members) < batch_size:
+            return written
+
+
+def _save_entries(entries):
+    """
+    Internal helper upserting buffered entries, skipping users and videos deleted in the meantime.
+    """
+    if not entries:
+        return 0
+
+    users = get_user_model().objects.filter(pk__in={user_id for user_id, _ in entries})
+    videos = Video.objects.filter(pk__in={video_id for _, video_id in entries})
+    user_ids = set(users.values_list('pk', flat=True))
+    video_ids = set(videos.values_list('pk', flat=True))
+
+    rows = [
+        WatchProgress(
+            user_id=user_id, video_id=video_id, position=entry['position'],
+            updated_at=datetime.fromtimestamp(entry['at'], tz=timezone.utc),
+        )
+        for (user_id, video_id), entry in entries.items()
+        if user_id in user_ids and video_id in video_ids
+    ]
+    WatchProgress.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['user', 'video'], update_fields=['position', 'updated_at']
+    )
+    return len(rows)
@@ -0,0 +1,205 @@
+import json
+import os
+import subprocess
+
+from django.conf import settings
+
+from .layout import resolve_playlist
+from .models import Rendition
+from .probe import parse_bitrate, parse_frame_rate
+
+# RFC 6381 profile_idc and constraint flags for the H.264 profiles ffprobe reports.
+H264_PROFILES = {
+    'Constrained Baseline': '42E0',
+    'Baseline': '4200',
+    'Main': '4D40',
+    'High': '6400',
+}
+
+AAC_PROFILES = {
+    'LC': 'mp4a.40.2',
+    'HE-AAC': 'mp4a.40.5',
+    'HE-AACv2': 'mp4a.40.29',
+}
+
+
+def master_playlist_cache_key(video_id):
+    """
+    Returns the cache key of the generated master playlist of a video.
+    """
+    return f'video:{video_id}:master.m3u8'
+
+
+def plan_renditions(metadata):
+    """
+    Selects the configured renditions worth producing for a probed source.
+
+    Renditions taller than the source are skipped so nothing is upscaled; if
+    the source is smaller than every rendition, only the smallest one is kept.
+    A rendition is marked for remuxing (stream copy instead of re-encoding)
+    when the source already is 8-bit 4:2:0 H.264 at exactly that height and
+    within its bitrate cap.
+    """
+    renditions = sorted(settings.VIDEO_RENDITIONS, key=lambda rendition: rendition['height'])
+    height = metadata.get('height') if metadata else None
+
+    if not height:
+        return [{'label': rendition['label'], 'remux': False} for rendition in renditions]
+
+    selected = [rendition for rendition in renditions if rendition['height'] <= height] or renditions[:1]
+
+    plan = []
+    for rendition in selected:
+        remux = (
+            metadata['video_codec'] == 'h264'
+            and metadata['pix_fmt'] == 'yuv420p'
+            and rendition['height'] == height
+            and metadata['video_bitrate'] is not None
+            and metadata['video_bitrate'] <= parse_bitrate(rendition['video_bitrate'])
+        )
+        plan.append({'label': rendition['label'], 'remux': remux})
+    return plan
+
+
+def register_renditions(video, labels):
+    """
+    Measures the finished renditions of a video and stores their metadata.
+
+    Existing rows for the same labels are replaced, so re-running a transcode
+    refreshes the advertised bandwidth and codecs. Every video sharing the
+    same media asset gets the rows as well, since they share the files.
+    """
+    videos = list(video.asset.videos.all()) if video.asset_id else [video]
+    for label in labels:
+        path = resolve_playlist(video, label)
+        if path is None or not os.path.exists(path):
+            continue
+
+        segments = parse_playlist(path)
+        if not segments:
+            continue
+
+        stream_info = _probe_segment(segments[0][0])
+        if stream_info is None:
+            continue
+
+        total_bits = sum(os.path.getsize(segment) * 8 for segment, _ in segments)
+        total_duration = sum(duration for _, duration in segments) or 1
+        peak = max(os.path.getsize(segment) * 8 / (duration or 1) for segment, duration in segments)
+
+        for target in videos:
+            Rendition.objects.update_or_create(
+                video=target, label=label,
+                defaults={
+                    'width': stream_info['width'],
+                    'height': stream_info['height'],
+                    'bandwidth': int(peak),
+                    'average_bandwidth': int(total_bits / total_duration),
+                    'codecs': stream_info['codecs'],
+                    'frame_rate': stream_info['frame_rate'],
+                }
+            )
+
+
+def share_renditions(source, target):
+    """
+    Copies the rendition rows of one video to another video with the same media asset.
+    """
+    for rendition in source.renditions.all():
+        Rendition.objects.update_or_create(
+            video=target, label=rendition.label,
+            defaults={
+                'width': rendition.width,
+                'height': rendition.height,
+                'bandwidth': rendition.bandwidth,
+                'average_bandwidth': rendition.average_bandwidth,
+                'codecs': rendition.codecs,
+                'frame_rate': rendition.frame_rate,
+            }
+        )
+
+
+def parse_playlist(path):
+    """
+    Returns (segment path, duration) tuples for every segment of a media playlist.
+    """
+    directory = os.path.dirname(path)
+    segments = []
+    duration = None
+
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#EXTINF:'):
+                duration = float(line[len('#EXTINF:'):].split(',')[0])
+            elif line and not line.startswith('#') and duration is not None:
+                segments.append((os.path.join(directory, line), duration))
+                duration = None
+
+    return [(segment, duration) for segment, duration in segments if os.path.exists(segment)]
+
+
+def build_master_playlist(renditions):
+    """
+    Builds an HLS master playlist listing the given renditions.
+
+    Variant URIs are relative to `/api/video/<id>/master.m3u8`, i.e. they point
+    to the existing per-resolution playlist endpoint.
+    """
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-INDEPENDENT-SEGMENTS']
+
+    for rendition in renditions:
+        attributes = [
+            f'BANDWIDTH={rendition.bandwidth}',
+            f'AVERAGE-BANDWIDTH={rendition.average_bandwidth}',
+            f'RESOLUTION={rendition.width}x{rendition.height}',
+            f'CODECS="{rendition.codecs}"',
+        ]
+        if rendition.frame_rate:
+            attributes.append(f'FRAME-RATE={rendition.frame_rate:.3f}')
+
+        lines.append('#EXT-X-STREAM-INF:' + ','.join(attributes))
+        lines.append(f'{rendition.label}/index.m3u8')
+
+    return '\n'.join(lines) + '\n'
+
+
+def _probe_segment(path):
+    """
+    Internal helper that reads resolution, frame rate and RFC 6381 codecs of a segment.
+    """
+    cmd = [
+        'ffprobe', '-v', 'error', '-show_entries',
+        'stream=codec_type,codec_name,profile,level,width,height,avg_frame_rate',
+        '-of', 'json', path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    try:
+        streams = json.loads(result.stdout)['streams']
+    except (ValueError, KeyError):
+        return None
+
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    if video is None:
+        return None
+
+    codecs = [_video_codec(video)]
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+    if audio is not None:
+        codecs.append(AAC_PROFILES.get(audio.get('profile'), 'mp4a.40.2'))
+
+    return {
+        'width': video['width'],
+        'height': video['height'],
+        'codecs': ','.join(codecs),
+        'frame_rate': parse_frame_rate(video.get('avg_frame_rate')),
+    }
+
+
+def _video_codec(stream):
+    """
+    Internal helper that formats an H.264 stream as an `avc1.PPCCLL` codecs entry.
+    """
+    profile = H264_PROFILES.get(stream.get('profile'), '4D40')
+    level = int(stream.get('level') or 31)
+    return f'avc1.{profile}{level:02X}'.lower()
@@ -0,0 +1,251 @@
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from django.utils import timezone
+from rq import get_current_job
+
+from core import metrics
+
+from .models import TranscodeJob
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of seconds between two progress writes to the database.
+PROGRESS_WRITE_INTERVAL = 2
+
+
+def available_cores():
+    """
+    Returns the number of CPU cores this process is allowed to run on.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def encode_slots():
+    """
+    Returns the maximum number of concurrent ffmpeg encodes on this node.
+    """
+    return settings.VIDEO_TRANSCODE_CONCURRENCY or available_cores()
+
+
+@contextmanager
+def encode_slot():
+    """
+    Blocks until one of the node's encode slots is free and holds it.
+
+    Slots are exclusive file locks in VIDEO_TRANSCODE_LOCK_DIR, so every RQ
+    worker process on the same machine shares the same cap. The kernel drops
+    the lock when a worker dies, which means a crashed job never leaks a slot.
+    """
+    import fcntl
+
+    os.makedirs(settings.VIDEO_TRANSCODE_LOCK_DIR, exist_ok=True)
+
+    while True:
+        for slot in range(encode_slots()):
+            lock_path = os.path.join(settings.VIDEO_TRANSCODE_LOCK_DIR, f'slot-{slot}.lock')
+            lock_file = open(lock_path, 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+
+            try:
+                yield slot
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+            return
+
+        time.sleep(1)
+
+
+def probe_duration(source):
+    """
+    Returns the duration of a media file in seconds, or None if it is unknown.
+    """
+    cmd = [
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1', source
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def run_transcode(job, cmd, source, on_progress=None):
+    """
+    Runs an ffmpeg command for a transcode job and blocks until it exits.
+
+    Waits for a free encode slot first, then streams ffmpeg's machine-readable
+    progress output into the job record (state, percentage and fps) and
+    finally stores the exit status. Raises CalledProcessError if ffmpeg fails
+    so RQ marks the job as failed as well.
+
+    `on_progress` is called along with every progress write, at most every
+    PROGRESS_WRITE_INTERVAL seconds (e.g. to upload finished segments).
+    """
+    duration = job.video.duration or probe_duration(source)
+
+    with encode_slot():
+        TranscodeJob.objects.filter(pk=job.pk).update(
+            state=TranscodeJob.STATE_RUNNING, started_at=timezone.now()
+        )
+        returncode, error = _run_ffmpeg(job, cmd, duration, 'encode', on_progress=on_progress)
+
+    if returncode == 0:
+        TranscodeJob.objects.filter(pk=job.pk).update(
+            state=TranscodeJob.STATE_FINISHED, progress=100, exit_status=0,
+            finished_at=timezone.now()
+        )
+        return
+
+    TranscodeJob.objects.filter(pk=job.pk).update(
+        state=TranscodeJob.STATE_FAILED, exit_status=returncode, error=error,
+        finished_at=timezone.now()
+    )
+    raise subprocess.CalledProcessError(returncode, cmd, stderr=error)
+
+
+def run_step(job, cmd, step, progress=0, rendition=None):
+    """
+    Runs one ffmpeg step (split, chunk, audio or stitch) of a chunked transcode job in an encode slot.
+
+    Many steps of the same job run in parallel on different workers, so the
+    job is only moved to running by the first one and each finished step adds
+    its share to the progress (capped below 100 until the stitch finishes).
+    Raises CalledProcessError if ffmpeg fails. The job is only marked as
+    failed once the RQ job running the step has no retries left; until then
+    the other steps keep it running.
+    """
+    with encode_slot():
+        TranscodeJob.objects.filter(pk=job.pk, state=TranscodeJob.STATE_QUEUED).update(
+            state=TranscodeJob.STATE_RUNNING, started_at=timezone.now()
+        )
+        returncode, error = _run_ffmpeg(job, cmd, None, step, rendition)
+
+    if returncode != 0 and _will_retry():
+        logger.warning("Step %s of transcode job %s failed with status %s, retrying", step, job.pk, returncode)
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=error)
+
+    if returncode != 0:
+        TranscodeJob.objects.filter(pk=job.pk).update(
+            state=TranscodeJob.STATE_FAILED, exit_status=returncode, error=error,
+            finished_at=timezone.now()
+        )
+        raise subprocess.CalledProcessError(returncode, cmd, stderr=error)
+
+    if progress:
+        TranscodeJob.objects.filter(pk=job.pk).update(progress=Least(F('progress') + progress, Value(99.0)))
+
+
+def progress_cmd(cmd, threads=None):
+    """
+    Returns an ffmpeg command that reports `-progress` on stdout and only logs errors.
+
+    `threads` (default VIDEO_TRANSCODE_THREADS, 0 for ffmpeg's choice) is set
+    on the last output.
+    """
+    threads = settings.VIDEO_TRANSCODE_THREADS if threads is None else threads
+    cmd = [cmd[0], '-nostats', '-loglevel', 'error', '-progress', 'pipe:1'] + cmd[1:]
+    if threads:
+        cmd[-1:-1] = ['-threads', str(threads)]
+    return cmd
+
+
+def _will_retry():
+    """
+    Internal helper checking whether RQ retries the current job if it fails now.
+
+    RQ only decrements `retries_left` after handling the failure, so any
+    value above zero means another attempt follows.
+    """
+    current = get_current_job()
+    return current is not None and bool(current.retries_left)
+
+
+def _run_ffmpeg(job, cmd, duration, step, rendition=None, on_progress=None):
+    """
+    Internal helper that executes ffmpeg and parses its `-progress` output.
+
+    Returns a tuple of the exit status and the tail of ffmpeg's error log.
+    If the RQ job is interrupted (e.g. by its timeout) ffmpeg is killed so no
+    orphaned encoder keeps running on the node.
+
+    ffmpeg is reaped with `os.wait4`, so the wall and CPU time of every run
+    are recorded per step and rendition ('all' for runs writing the ladder).
+    """
+    cmd = progress_cmd(cmd)
+
+    with tempfile.TemporaryFile() as stderr:
+        start = time.monotonic()
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, text=True)
+        try:
+            _track_progress(job, process.stdout, duration, on_progress)
+            _, wait_status, usage = os.wait4(process.pid, 0)
+            returncode = process.returncode = os.waitstatus_to_exitcode(wait_status)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+        stderr.seek(0)
+        error = stderr.read()[-4000:].decode(errors='replace')
+
+    labels = {'step': step, 'rendition': rendition or job.rendition or 'all'}
+    metrics.observe('videoflix_ffmpeg_wall_seconds', time.monotonic() - start, **labels)
+    metrics.observe('videoflix_ffmpeg_cpu_seconds', usage.ru_utime + usage.ru_stime, **labels)
+    return returncode, error
+
+
+def _track_progress(job, output, duration, on_progress=None):
+    """
+    Internal helper that reads ffmpeg progress blocks and persists them.
+
+    ffmpeg emits `key=value` lines and terminates every block with a
+    `progress=continue` or `progress=end` line.
+    """
+    values = {}
+    last_write = 0
+
+    for line in output:
+        key, _, value = line.strip().partition('=')
+        values[key] = value
+
+        if key != 'progress':
+            continue
+
+        now = time.monotonic()
+        if value != 'end' and now - last_write < PROGRESS_WRITE_INTERVAL:
+            continue
+        last_write = now
+
+        update = {}
+        try:
+            update['fps'] = float(values.get('fps', ''))
+        except ValueError:
+            pass
+        try:
+            out_time = int(values.get('out_time_us', '')) / 1_000_000
+            if duration:
+                update['progress'] = round(min(out_time / duration * 100, 100), 1)
+        except ValueError:
+            pass
+
+        if update:
+            TranscodeJob.objects.filter(pk=job.pk).update(**update)
+        if on_progress is not None:
+            on_progress()
@@ -1,51 +1,60 @@
+import logging
 import os
-import subprocess
-from django.core.files import File
+import shutil
+from django.core.cache import cache
+from django.db import transaction
 from django.dispatch import receiver
 from django.db.models.signals import post_save, post_delete
 import django_rq
 
-from .models import Video
-from .tasks import convert_480p, convert_720p, convert_1080p
+from .assets import release_asset
+from .catalogue import bump_catalogue_version
+from .layout import output_dir
+from .models import Rendition, Video
+from .renditions import master_playlist_cache_key
+from .storage import delete_prefix, rendition_storage, storage_prefix
+from .tasks import generate_thumbnails, ingest_video
+
+logger = logging.getLogger(__name__)
 
 @receiver(post_save, sender=Video)
 def video_post_save(sender, instance, created, **kwargs):
     """
     Signal receiver that handles actions after a Video object is saved.
-    
-    If a new video is created, it enqueues conversion tasks.
-    If the video has no thumbnail, it generates one automatically from the first second.
+
+    If a new video is created, it enqueues the ingest stage, which hashes and
+    probes the source, then reuses or transcodes its outputs and thumbnails.
+    If an existing video has no thumbnail, it enqueues the thumbnail stage which
+    renders all thumbnail sizes and formats in the background.
+    Every save invalidates the cached catalogue pages once it is committed.
     """
+    transaction.on_commit(bump_catalogue_version)
+
     if created:
-        print(f'New video created: {instance.id}')
-        queue = django_rq.get_queue('default', autocommit=True)
-        
-        queue.enqueue(convert_480p, instance.video_file.path)
-        queue.enqueue(convert_720p, instance.video_file.path)
-        queue.enqueue(convert_1080p, instance.video_file.path)
-
-    if not instance.thumbnail and instance.video_file:
-        video_path = instance.video_file.path
-        base, _ = os.path.splitext(video_path)
-        temp_thumb_path = f"{base}_temp_thumb.jpg"
-
-        cmd = [
-            'ffmpeg', '-i', video_path, '-ss', '00:00:01.000', 
-            '-vframes', '1', temp_thumb_path, '-y'
-        ]
-        
-        try:
-            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-            
-            if os.path.exists(temp_thumb_path):
-                with open(temp_thumb_path, 'rb') as f:
-                    filename = f"{os.path.basename(base)}_thumbnail.jpg"
-                    instance.thumbnail.save(filename, File(f), save=False)
-                
-                instance.save(update_fields=['thumbnail'])
-                os.remove(temp_thumb_path)
-        except subprocess.CalledProcessError:
-            print(f"Failed to generate thumbnail for {video_path}")
+        logger.info('New video created: %s', instance.id)
+
+        # Enqueue only after the surrounding transaction has committed so the
+        # worker is guaranteed to find the new row.
+        transaction.on_commit(lambda: _enqueue_ingest_job(instance.pk))
+
+    elif not instance.thumbnail and instance.video_file:
+        transaction.on_commit(lambda: _enqueue_thumbnail_job(instance.pk))
+
+
+def _enqueue_ingest_job(video_id):
+    """
+    Enqueues the ingest stage which probes the source and schedules the transcodes.
+    """
+    queue = django_rq.get_queue('default', autocommit=True)
+    queue.enqueue(ingest_video, video_id)
+
+
+def _enqueue_thumbnail_job(video_id):
+    """
+    Enqueues thumbnail generation so ffmpeg never runs inside the saving request.
+    """
+    queue = django_rq.get_queue('default', autocommit=True)
+    queue.enqueue(generate_thumbnails, video_id)
 
 
 @receiver(post_delete, sender=Video)
@@ -53,14 +62,41 @@ def video_post_delete(sender, instance, **kwargs):
     """
     Signal receiver that handles actions after a Video object is deleted.
     
-    It deletes the associated video and thumbnail files from the filesystem.
+    It deletes the associated video file, releases the video's media asset
+    (whose HLS outputs are only removed with the last reference) and deletes
+    the thumbnail files (including all variants) unless another video shares
+    them. Outputs in object storage are deleted together with the local ones.
+    Finally it invalidates the cached catalogue pages.
     """
+    transaction.on_commit(bump_catalogue_version)
+
     if instance.video_file:
         if os.path.isfile(instance.video_file.path):
             os.remove(instance.video_file.path)
-            print(f'File deleted: {instance.video_file.path}')
+            logger.info('File deleted: %s', instance.video_file.path)
             
-    if instance.thumbnail:
-        if os.path.isfile(instance.thumbnail.path):
-            os.remove(instance.thumbnail.path)
-            print(f'Thumbnail deleted: {instance.thumbnail.path}')
\ No newline at end of file
+    # Duplicate uploads point at the thumbnail files of the first upload.
+    thumbnail_shared = bool(instance.thumbnail) and Video.objects.filter(thumbnail=instance.thumbnail.name).exists()
+
+    if instance.thumbnail and not thumbnail_shared:
+        instance.thumbnail.storage.delete(instance.thumbnail.name)
+        logger.info('Thumbnail deleted: %s', instance.thumbnail.name)
+
+    if not thumbnail_shared:
+        for name in instance.thumbnail_variants.values():
+            rendition_storage().delete(name)
+
+    release_asset(instance)
+    shutil.rmtree(output_dir(instance.pk), ignore_errors=True)
+    if instance.asset_id is None:
+        delete_prefix(storage_prefix(instance))
+
+
+@receiver(post_save, sender=Rendition)
+@receiver(post_delete, sender=Rendition)
+def rendition_changed(sender, instance, **kwargs):
+    """
+    Signal receiver that drops the cached master playlist and catalogue pages when a rendition changes.
+    """
+    cache.delete(master_playlist_cache_key(instance.video_id))
+    bump_catalogue_version()
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""
+Storage of HLS renditions and thumbnails.
+
+ffmpeg always writes into the local output tree (see `layout`). With
+VIDEO_STORAGE='s3' the outputs are published to the 'renditions' storage, an
+S3-compatible bucket (AWS S3, MinIO, ...), under the same relative names as
+below MEDIA_ROOT: segments are uploaded while ffmpeg writes them (see
+`RenditionPublisher`) and the streaming views answer segment requests with
+short-lived presigned redirects. Web and worker processes then only share
+the bucket, not a disk.
+
+With the default VIDEO_STORAGE='local' the 'renditions' storage is MEDIA_ROOT
+itself and nothing is published.
+"""
+import logging
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import storages
+from storages.backends.s3 import S3Storage
+from storages.utils import clean_name
+
+from .layout import LABEL_RE, PLAYLIST_NAME, SEGMENT_RE, asset_dir, output_dir, rendition_dir
+
+logger = logging.getLogger(__name__)
+
+# Object parameters per extension; segments never change once listed in a playlist.
+OBJECT_PARAMETERS = {
+    '.ts': {'ContentType': 'video/MP2T', 'CacheControl': 'private, max-age=31536000, immutable'},
+    '.m3u8': {'ContentType': 'application/vnd.apple.mpegurl', 'CacheControl': 'private, no-cache'},
+}
+
+
+class RenditionS3Storage(S3Storage):
+    """
+    S3 storage of the renditions, with objects typed and cached per extension.
+
+    `public_endpoint_url` signs URLs for an endpoint other than the one the
+    application talks to, e.g. when MinIO is reached as `http://minio:9000`
+    inside Docker but as `http://localhost:9000` by browsers. Presigning
+    happens offline, so it costs no request either way.
+    """
+    def get_default_settings(self):
+        return {**super().get_default_settings(), 'public_endpoint_url': None}
+
+    def get_object_parameters(self, name):
+        params = super().get_object_parameters(name)
+        for key, value in OBJECT_PARAMETERS.get(posixpath.splitext(name)[1], {}).items():
+            params.setdefault(key, value)
+        return params
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        if not self.public_endpoint_url:
+            return super().url(name, parameters, expire, http_method)
+
+        params = {**(parameters or {}), 'Bucket': self.bucket_name, 'Key': self._normalize_name(clean_name(name))}
+        client = self._public_connection().meta.client
+        return client.generate_presigned_url(
+            'get_object', Params=params, ExpiresIn=expire or self.querystring_expire, HttpMethod=http_method
+        )
+
+    def delete_prefix(self, prefix):
+        """
+        Deletes every object below a prefix, up to 1000 per request.
+        """
+        prefix = self._normalize_name(clean_name(prefix)).rstrip('/') + '/'
+        self.bucket.objects.filter(Prefix=prefix).delete()
+
+    def _public_connection(self):
+        """
+        Internal helper returning the per-thread S3 resource of the public endpoint.
+        """
+        connection = getattr(self._connections, 'public_connection', None)
+        if connection is None:
+            connection = self._create_session().resource(
+                's3', region_name=self.region_name, use_ssl=self.use_ssl,
+                endpoint_url=self.public_endpoint_url, config=self.client_config, verify=self.verify,
+            )
+            self._connections.public_connection = connection
+        return connection
+
+
+class RenditionPublisher:
+    """
+    Uploads the HLS outputs of a transcode to the rendition storage while ffmpeg writes them.
+
+    ffmpeg only lists a segment in its playlist once the segment is complete,
+    so every `publish` uploads the newly listed segments and then the
+    playlist itself: a stored playlist never references a missing object.
+    Players watching a rendition that is still being encoded see it grow
+    like a live stream.
+    """
+    def __init__(self, video, labels):
+        self.directories = {label: rendition_dir(video.pk, label) for label in labels}
+        self.prefix = storage_prefix(video)
+        self.uploaded = set()
+        self.playlists = {}
+
+    def publish(self):
+        """
+        Uploads all segments and playlists that changed since the last call.
+        """
+        storage = rendition_storage()
+        for label, directory in self.directories.items():
+            path = os.path.join(directory, PLAYLIST_NAME)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if self.playlists.get(label) == (stat.st_mtime_ns, stat.st_size):
+                continue
+
+            for segment in _listed_segments(path):
+                if (label, segment) not in self.uploaded:
+                    _upload(storage, os.path.join(directory, segment), f'{self.prefix}/{label}/{segment}')
+                    self.uploaded.add((label, segment))
+
+            name = f'{self.prefix}/{label}/{PLAYLIST_NAME}'
+            _upload(storage, path, name)
+            cache.delete(stored_playlist_cache_key(name))
+            self.playlists[label] = (stat.st_mtime_ns, stat.st_size)
+
+    def publish_progress(self):
+        """
+        `publish` for progress callbacks: failed uploads are logged and retried on the next call.
+        """
+        try:
+            self.publish()
+        except Exception:
+            logger.warning("Uploading renditions to %s failed, retrying later", self.prefix, exc_info=True)
+
+
+def rendition_storage():
+    """
+    Returns the storage holding renditions and thumbnails (STORAGES['renditions']).
+    """
+    return storages['renditions']
+
+
+def is_remote():
+    """
+    Checks whether renditions are delivered from object storage instead of MEDIA_ROOT.
+    """
+    return settings.VIDEO_STORAGE == 's3'
+
+
+def publisher(video, labels):
+    """
+    Returns a RenditionPublisher for the given renditions of a video, or None in local mode.
+    """
+    return RenditionPublisher(video, labels) if is_remote() else None
+
+
+def storage_prefix(video):
+    """
+    Returns the storage name of the directory holding a video's outputs.
+
+    Videos with a media asset share the content-addressed directory of the
+    asset, all others use their sharded output directory.
+    """
+    directory = asset_dir(video.content_hash) if video.asset_id else output_dir(video.pk)
+    return os.path.relpath(directory, settings.MEDIA_ROOT).replace(os.sep, '/')
+
+
+def playlist_object(video, label):
+    """
+    Returns the storage name of a rendition's playlist, or None for invalid labels.
+    """
+    if not LABEL_RE.match(label):
+        return None
+    return f'{storage_prefix(video)}/{label}/{PLAYLIST_NAME}'
+
+
+def segment_object(video_id, label, segment, video=None):
+    """
+    Returns the storage name of a segment, or None for invalid names.
+
+    Signed segment requests carry no video; the prefix is then looked up
+    once and cached until the video's media asset changes (see `acquire_asset`).
+    """
+    if not LABEL_RE.match(label) or not SEGMENT_RE.match(segment):
+        return None
+
+    prefix = cache.get(prefix_cache_key(video_id)) if video is None else None
+    if prefix is None:
+        if video is None:
+            from .models import Video
+            video = Video.objects.filter(pk=video_id).only('pk', 'content_hash', 'asset').first()
+            if video is None:
+                return None
+        prefix = storage_prefix(video)
+        cache.set(prefix_cache_key(video_id), prefix, settings.VIDEO_PLAYLIST_CACHE_TIMEOUT)
+    return f'{prefix}/{label}/{segment}'
+
+
+def prefix_cache_key(video_id):
+    """
+    Returns the cache key of a video's storage prefix.
+    """
+    return f'video:{video_id}:storage-prefix'
+
+
+def stored_playlist_cache_key(name):
+    """
+    Returns the cache key of a playlist read from the rendition storage.
+    """
+    return f'video:stored-playlist:{name}'
+
+
+def delete_prefix(prefix):
+    """
+    Deletes all stored objects below a prefix; a no-op in local mode.
+    """
+    if is_remote():
+        rendition_storage().delete_prefix(prefix)
+
+
+def _listed_segments(path):
+    """
+    Internal helper returning the segment names listed in a local playlist.
+    """
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def _upload(storage, path, name):
+    """
+    Internal helper uploading one local file under the given storage name.
+    """
+    with open(path, 'rb') as f:
+        storage.save(name, File(f, name=os.path.basename(path)))
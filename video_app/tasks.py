@@ -1,41 +1,507 @@
+import glob
+import logging
 import os
+import shutil
 import subprocess
+import tempfile
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+import django_rq
+from rq import Callback, Retry
+from rq.job import Dependency
 
-def convert_480p(source):
+from .analytics import hot_videos, rollup
+from .api.delivery import read_playlist, read_stored_playlist
+from .assets import acquire_asset, hash_file
+from .catalogue import bump_catalogue_version
+from .encoding import (
+    audio_cmd, audio_path, chunk_cmd, ladder_cmd, rendition_cmd, split_cmd, stitch_cmd, write_chunk_list,
+)
+from .layout import link_output, output_dir, rendition_dir, resolve_playlist
+from .models import MediaAsset, TranscodeJob, Video
+from .probe import has_audio, probe_media
+from .progress import flush_progress
+from .renditions import (
+    build_master_playlist, master_playlist_cache_key, parse_playlist, plan_renditions, register_renditions,
+    share_renditions,
+)
+from .scheduler import run_step, run_transcode
+from .storage import is_remote, playlist_object, publisher, rendition_storage
+
+logger = logging.getLogger(__name__)
+
+
+def ingest_video(video_id):
+    """
+    Hashes and probes a new upload, stores its media metadata and enqueues the transcodes.
+
+    The rendition ladder is derived from the probed source: renditions above
+    the source resolution are skipped and renditions matching the source are
+    remuxed instead of re-encoded (see `plan_renditions`).
+
+    The SHA-256 of the source selects a shared media asset. If an identical
+    source was uploaded before, its renditions and thumbnails are reused and
+    nothing is transcoded (see `_reuse_asset`). The decision is taken under a
+    row lock on the asset, so concurrent duplicates start a single transcode.
+    """
+    video = Video.objects.get(pk=video_id)
+    asset, _ = acquire_asset(video, hash_file(video.video_file.path))
+    if not link_output(video.pk, asset.content_hash):
+        logger.info("Video %s keeps its existing output directory", video_id)
+
+    metadata = probe_media(video.video_file.path)
+
+    if metadata is not None:
+        Video.objects.filter(pk=video_id).update(
+            duration=metadata['duration'],
+            width=metadata['width'],
+            height=metadata['height'],
+            bitrate=metadata['bitrate'],
+            frame_rate=metadata['frame_rate'],
+            video_codec=metadata['video_codec'],
+            audio_codec=metadata['audio_codec'],
+        )
+        bump_catalogue_version()
+    else:
+        logger.warning("Failed to probe %s", video.video_file.path)
+
+    queue = django_rq.get_queue('default', autocommit=True)
+    video.refresh_from_db(fields=['thumbnail'])
+    if not video.thumbnail:
+        queue.enqueue(generate_thumbnails, video.pk)
+
+    with transaction.atomic():
+        MediaAsset.objects.select_for_update().get(pk=asset.pk)
+        if _reuse_asset(video, asset):
+            logger.info("Video %s reuses the outputs of asset %s", video_id, asset.content_hash[:12])
+            return
+        jobs = _create_jobs(video, plan_renditions(metadata))
+        transaction.on_commit(lambda: _enqueue_jobs(jobs))
+
+
+def transcode_failed(rq_job, connection, exc_type, exc_value, traceback):
+    """
+    RQ failure callback of every transcode step.
+
+    Once the step has no retries left, its TranscodeJob is marked as failed
+    (ffmpeg failures already did that; timeouts and crashes did not) and the
+    other videos of the asset that waited for this transcode instead of
+    starting their own are ingested again, so one of them takes over. Videos
+    that already had a transcode of their own are not retried.
+    """
+    if rq_job.retries_left:
+        return
+
+    job = TranscodeJob.objects.select_related('video').filter(pk=rq_job.args[0]).first()
+    if job is None:
+        return
+    TranscodeJob.objects.filter(
+        pk=job.pk, state__in=[TranscodeJob.STATE_QUEUED, TranscodeJob.STATE_RUNNING]
+    ).update(
+        state=TranscodeJob.STATE_FAILED, error=f'{exc_type.__name__}: {exc_value}'[-4000:],
+        finished_at=timezone.now()
+    )
+
+    if job.video.asset_id is None:
+        return
+    waiting = Video.objects.filter(
+        asset_id=job.video.asset_id, renditions__isnull=True, transcode_jobs__isnull=True
+    ).exclude(pk=job.video_id)
+    queue = django_rq.get_queue('default', autocommit=True)
+    for video_id in waiting.values_list('pk', flat=True):
+        logger.info("Transcode job %s failed, ingesting waiting video %s again", job.pk, video_id)
+        queue.enqueue(ingest_video, video_id)
+
+
+def convert_ladder(job_id):
+    """
+    Creates every planned rendition in one ffmpeg run.
+
+    The source is decoded once and the decoded frames are split into one
+    scaler/encoder per rendition. Each rendition is written to its own
+    directory of the video's output tree (see `layout.output_dir`) and, with
+    object storage, uploaded while ffmpeg writes it (see `RenditionPublisher`).
+    """
+    job = TranscodeJob.objects.select_related('video').get(pk=job_id)
+    video = job.video
+    source = video.video_file.path
+    plan = _job_plan(job)
+    labels = [entry['label'] for entry in plan]
+
+    for label in labels:
+        os.makedirs(rendition_dir(video.pk, label), exist_ok=True)
+
+    cmd = ladder_cmd(source, plan, _source_has_audio(video), output_dir(video.pk))
+    outputs = publisher(video, labels)
+    run_transcode(job, cmd, source, on_progress=outputs and outputs.publish_progress)
+    if outputs:
+        outputs.publish()
+    register_renditions(video, labels)
+
+
+def convert_rendition(job_id):
+    """
+    Creates the HLS playlist and segments for a single configured rendition.
+    """
+    job = TranscodeJob.objects.select_related('video').get(pk=job_id)
+    source = job.video.video_file.path
+    entry = _job_plan(job)[0]
+    target_dir = rendition_dir(job.video_id, entry['label'])
+    os.makedirs(target_dir, exist_ok=True)
+
+    outputs = publisher(job.video, [entry['label']])
+    cmd = rendition_cmd(source, entry['label'], entry['remux'], target_dir)
+    run_transcode(job, cmd, source, on_progress=outputs and outputs.publish_progress)
+    if outputs:
+        outputs.publish()
+    register_renditions(job.video, [entry['label']])
+
+
+def split_source(job_id):
+    """
+    First stage of a chunked transcode: cuts the source video into chunks.
+
+    The video stream is stream-copied into pieces of about VIDEO_CHUNK_SECONDS
+    (a multiple of VIDEO_HLS_TIME); the segment muxer only cuts on keyframes,
+    so every chunk decodes on its own. One `encode_chunk` job per chunk and one
+    `encode_audio` job are then enqueued for any worker to pick up, followed by
+    `stitch_chunks`, which RQ only starts once all of them have succeeded.
+    """
+    job = TranscodeJob.objects.select_related('video').get(pk=job_id)
+    video = job.video
+    source = video.video_file.path
+    work_dir = _chunk_dir(video.pk)
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(os.path.join(work_dir, 'source'))
+    run_step(job, split_cmd(source, os.path.join(work_dir, 'source')), 'split')
+
+    count = len(glob.glob(os.path.join(work_dir, 'source', '*.mkv')))
+    if count == 0:
+        raise RuntimeError(f"Splitting {source} produced no chunks.")
+
+    plan = _job_plan(job)
+    queue = django_rq.get_queue('default', autocommit=True)
+    options = {
+        'job_timeout': settings.VIDEO_TRANSCODE_TIMEOUT, 'retry': Retry(max=2), 'on_failure': Callback(transcode_failed),
+    }
+
+    steps = [queue.enqueue(encode_chunk, job.pk, index, count, **options) for index in range(count)]
+    if _source_has_audio(video):
+        steps.append(queue.enqueue(encode_audio, job.pk, **options))
+
+    queue.enqueue(
+        stitch_chunks, job.pk, count, depends_on=Dependency(jobs=steps),
+        job_timeout=settings.VIDEO_TRANSCODE_TIMEOUT, on_failure=Callback(transcode_failed),
+    )
+    logger.info("Split %s into %d chunks for %d renditions", source, count, len(plan))
+
+
+def encode_chunk(job_id, index, count):
+    """
+    Encodes one source chunk into every planned rendition in a single ffmpeg run.
+
+    Nothing is encoded once another step has failed the job for good.
+    """
+    job = TranscodeJob.objects.select_related('video').get(pk=job_id)
+    if job.state == TranscodeJob.STATE_FAILED:
+        return
+    work_dir = _chunk_dir(job.video_id)
+    plan = _job_plan(job)
+
+    for entry in plan:
+        os.makedirs(os.path.join(work_dir, entry['label']), exist_ok=True)
+
+    cmd = chunk_cmd(os.path.join(work_dir, 'source', f'{index:04d}.mkv'), plan, work_dir, index)
+    run_step(job, cmd, 'chunk', progress=90 / count)
+
+
+def encode_audio(job_id):
+    """
+    Encodes the audio track of the source once per distinct rendition audio bitrate.
+
+    Audio is not chunked: AAC priming samples at every cut would be audible,
+    and encoding a full audio track is cheap compared to the video.
+    """
+    job = TranscodeJob.objects.select_related('video').get(pk=job_id)
+    if job.state == TranscodeJob.STATE_FAILED:
+        return
+    source = job.video.video_file.path
+    work_dir = _chunk_dir(job.video_id)
+    run_step(job, audio_cmd(source, _job_plan(job), work_dir), 'audio', progress=5)
+
+
+def stitch_chunks(job_id, count):
+    """
+    Last stage of a chunked transcode: joins the encoded chunks into HLS renditions.
+
+    The chunks of each rendition are concatenated without re-encoding, muxed
+    with the separately encoded audio and segmented into the video's output
+    directory, which is then published to object storage if configured. The
+    chunk working directory is removed afterwards.
+    """
+    job = TranscodeJob.objects.select_related('video').get(pk=job_id)
+    video = job.video
+    work_dir = _chunk_dir(video.pk)
+    plan = _job_plan(job)
+    has_audio = _source_has_audio(video)
+
+    for entry in plan:
+        label = entry['label']
+        list_path = os.path.join(work_dir, f'{label}.txt')
+        write_chunk_list(list_path, work_dir, label, count)
+        audio = audio_path(work_dir, label) if has_audio else None
+
+        target_dir = rendition_dir(video.pk, label)
+        os.makedirs(target_dir, exist_ok=True)
+        run_step(job, stitch_cmd(list_path, audio, target_dir), 'stitch', rendition=label)
+
+    outputs = publisher(video, [entry['label'] for entry in plan])
+    if outputs:
+        outputs.publish()
+
+    TranscodeJob.objects.filter(pk=job.pk).update(
+        state=TranscodeJob.STATE_FINISHED, progress=100, exit_status=0, finished_at=timezone.now()
+    )
+    register_renditions(video, [entry['label'] for entry in plan])
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def flush_watch_progress():
     """
-    Creates a 480p HLS playlist and segments.
+    Writes the buffered watch positions to the database (run by the RQ cron scheduler).
+
+    Returns the number of upserted rows.
     """
-    _convert(source, '480p', 'hd480')
+    return flush_progress(settings.WATCH_PROGRESS_BATCH_SIZE)
 
 
-def convert_720p(source):
+def rollup_view_stats():
     """
-    Creates a 720p HLS playlist and segments.
+    Writes the segment counters to VideoViewStats and refreshes the trending scores (run by the RQ cron scheduler).
+
+    Returns the number of upserted rows.
     """
-    _convert(source, '720p', 'hd720')
+    return rollup()
 
 
-def convert_1080p(source):
+def prewarm_hot_videos():
     """
-    Creates a 1080p HLS playlist and segments.
+    Pre-warms the caches of the currently hottest videos (run by the RQ cron scheduler).
+
+    The master and variant playlists are loaded into the Django cache and
+    the kernel is asked to read ahead the first ANALYTICS_PREWARM_SEGMENTS
+    segments of every rendition, so new viewers start from memory. With
+    object storage only the playlists are loaded, since segments are
+    fetched from the bucket. Returns the number of pre-warmed videos.
     """
-    _convert(source, '1080p', 'hd1080')
+    videos = Video.objects.filter(pk__in=hot_videos()).prefetch_related('renditions')
+    for video in videos:
+        renditions = list(video.renditions.all())
+        if renditions and cache.get(master_playlist_cache_key(video.pk)) is None:
+            cache.set(master_playlist_cache_key(video.pk), build_master_playlist(renditions), None)
 
+        for rendition in renditions:
+            if is_remote():
+                _prewarm_stored_playlist(video, rendition.label)
+                continue
+            path = resolve_playlist(video, rendition.label)
+            if path is None or not os.path.exists(path):
+                continue
+            read_playlist(path)
+            for segment, _ in parse_playlist(path)[:settings.ANALYTICS_PREWARM_SEGMENTS]:
+                _read_ahead(segment)
 
-def _convert(source, label, resolution_cmd):
+    return len(videos)
+
+
+def generate_thumbnails(video_id):
     """
-    Internal helper function to run the ffmpeg command for HLS conversion.
-    Generates an .m3u8 playlist file.
+    Renders all configured thumbnail sizes and formats from a single decoded frame.
+
+    The seek happens on the input side so ffmpeg jumps to the nearest keyframe
+    instead of decoding from the start of the file. The largest JPEG becomes the
+    main thumbnail and every derivative is stored in `thumbnail_variants`; both
+    are written with one UPDATE so no further post_save signals fire; the
+    catalogue cache is invalidated explicitly instead.
     """
-    base, _ = os.path.splitext(source)
-    target = f"{base}_{label}.m3u8"
+    video = Video.objects.get(pk=video_id)
+    source = video.video_file.path
+    base = os.path.splitext(os.path.basename(source))[0]
+    widths = settings.VIDEO_THUMBNAIL_WIDTHS
+    formats = settings.VIDEO_THUMBNAIL_FORMATS
+
+    variants = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cmd = _thumbnail_cmd(source, tmp_dir, widths, formats)
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            logger.warning("Failed to generate thumbnails for %s", source)
+            return
+
+        for width in widths:
+            for extension in formats:
+                path = os.path.join(tmp_dir, f'{width}.{extension}')
+                if not os.path.exists(path):
+                    continue
+                with open(path, 'rb') as f:
+                    name = rendition_storage().save(f'thumbnails/{base}_{width}w.{extension}', File(f))
+                variants[f'{width}w.{extension}'] = name
+
+    if not variants:
+        logger.warning("Failed to generate thumbnails for %s", source)
+        return
+
+    jpegs = [variants[key] for key in (f'{width}w.jpg' for width in sorted(widths)) if key in variants]
+    thumbnail = jpegs[-1] if jpegs else next(iter(variants.values()))
+
+    Video.objects.filter(pk=video_id).update(thumbnail=thumbnail, thumbnail_variants=variants)
+    bump_catalogue_version()
+
+
+def _prewarm_stored_playlist(video, label):
+    """
+    Internal helper loading a playlist from object storage into the cache.
+    """
+    try:
+        read_stored_playlist(playlist_object(video, label))
+    except Http404:
+        pass
+
+
+def _read_ahead(path):
+    """
+    Internal helper asking the kernel to load a file into the page cache in the background.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+
+def _thumbnail_cmd(source, target_dir, widths, formats):
+    """
+    Internal helper that builds the ffmpeg command writing all thumbnail variants.
+    """
+    outputs = [(width, extension) for width in widths for extension in formats]
+    splits = ''.join(f'[t{i}]' for i in range(len(outputs)))
+    filters = [f'[0:v]split={len(outputs)}{splits}']
+    filters += [
+        f'[t{i}]scale=w=min({width}\\,iw):h=-2[o{i}]'
+        for i, (width, _) in enumerate(outputs)
+    ]
 
     cmd = [
-        'ffmpeg', '-i', source, '-s', resolution_cmd, 
-        '-c:v', 'libx264', '-crf', '23', '-c:a', 'aac', '-strict', '-2', 
-        '-start_number', '0', '-hls_time', '10', '-hls_list_size', '0', '-f', 'hls', target
+        'ffmpeg', '-y', '-ss', str(settings.VIDEO_THUMBNAIL_OFFSET), '-i', source,
+        '-filter_complex', ';'.join(filters)
     ]
 
-    # Run ffmpeg in the background (non-blocking)
-    subprocess.Popen(cmd)
\ No newline at end of file
+    for i, (width, extension) in enumerate(outputs):
+        quality = ['-quality', '80'] if extension == 'webp' else ['-q:v', '3']
+        cmd += ['-map', f'[o{i}]', '-frames:v', '1'] + quality
+        cmd.append(os.path.join(target_dir, f'{width}.{extension}'))
+
+    return cmd
+
+
+def _reuse_asset(video, asset):
+    """
+    Internal helper that lets a duplicate upload share the outputs of its media asset.
+
+    If another video of the asset already has renditions, they are copied to
+    this video together with the thumbnails (the files themselves are shared).
+    If any video of the asset (this one included, when ingest runs again) is
+    still being transcoded, its renditions are shared once they are
+    registered; should that transcode fail, `transcode_failed` ingests this
+    video again. Returns False if neither applies, in which case the asset
+    has to be transcoded (again). Callers hold the row lock of the asset.
+    """
+    siblings = Video.objects.filter(asset=asset).exclude(pk=video.pk)
+    donor = siblings.filter(renditions__isnull=False).distinct().first()
+
+    if donor is None:
+        return TranscodeJob.objects.filter(
+            video__asset=asset, state__in=[TranscodeJob.STATE_QUEUED, TranscodeJob.STATE_RUNNING]
+        ).exists()
+
+    share_renditions(donor, video)
+    if not video.thumbnail and donor.thumbnail:
+        Video.objects.filter(pk=video.pk).update(
+            thumbnail=donor.thumbnail.name, thumbnail_variants=donor.thumbnail_variants
+        )
+    bump_catalogue_version()
+    return True
+
+
+def _create_jobs(video, plan):
+    """
+    Internal helper creating the transcode jobs of a video for VIDEO_TRANSCODE_MODE.
+    """
+    if settings.VIDEO_TRANSCODE_MODE == 'ladder':
+        jobs = [TranscodeJob.objects.create(video=video, kind=TranscodeJob.KIND_LADDER, plan=plan)]
+    elif settings.VIDEO_TRANSCODE_MODE == 'chunked':
+        jobs = [TranscodeJob.objects.create(video=video, kind=TranscodeJob.KIND_CHUNKED, plan=plan)]
+    else:
+        jobs = [
+            TranscodeJob.objects.create(
+                video=video, kind=TranscodeJob.KIND_RENDITION, rendition=entry['label'], plan=[entry]
+            )
+            for entry in plan
+        ]
+    return jobs
+
+
+def _enqueue_jobs(jobs):
+    """
+    Internal helper enqueueing the first RQ job of every transcode job.
+    """
+    queue = django_rq.get_queue('default', autocommit=True)
+    tasks = {
+        TranscodeJob.KIND_LADDER: convert_ladder,
+        TranscodeJob.KIND_RENDITION: convert_rendition,
+        TranscodeJob.KIND_CHUNKED: split_source,
+    }
+    for job in jobs:
+        queue.enqueue(
+            tasks[job.kind], job.pk, job_timeout=settings.VIDEO_TRANSCODE_TIMEOUT,
+            on_failure=Callback(transcode_failed),
+        )
+
+
+def _job_plan(job):
+    """
+    Internal helper returning the rendition plan of a job.
+
+    Jobs created before the ingest stage existed have no plan and fall back to
+    the configured renditions without remuxing.
+    """
+    if job.plan:
+        return job.plan
+    if job.kind == TranscodeJob.KIND_RENDITION:
+        return [{'label': job.rendition, 'remux': False}]
+    return [{'label': rendition['label'], 'remux': False} for rendition in settings.VIDEO_RENDITIONS]
+
+
+def _source_has_audio(video):
+    """
+    Internal helper that uses the probed metadata when available.
+    """
+    if video.video_codec:
+        return bool(video.audio_codec)
+    return has_audio(video.video_file.path)
+
+
+def _chunk_dir(video_id):
+    """
+    Internal helper returning the working directory of a chunked transcode.
+    """
+    return os.path.join(output_dir(video_id), 'chunks')
@@ -0,0 +1,134 @@
+import base64
+import hashlib
+import os
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.text import get_valid_filename
+
+from .models import UploadSession, Video
+
+# Bytes read from the request per iteration, which bounds the memory of a chunk upload.
+READ_BLOCK_SIZE = 1024 * 1024
+
+CHECKSUM_ALGORITHMS = {'sha256': hashlib.sha256, 'sha1': hashlib.sha1, 'md5': hashlib.md5}
+
+
+class ChecksumMismatch(Exception):
+    """
+    Raised when a chunk does not match the checksum sent by the client.
+    """
+
+
+def parse_checksum(header):
+    """
+    Parses an `Upload-Checksum: <algorithm> <base64 digest>` header.
+
+    Returns an (algorithm, digest bytes) tuple or None if the header is absent.
+    Raises ValueError for unknown algorithms or malformed digests.
+    """
+    if not header:
+        return None
+    algorithm, _, digest = header.strip().partition(' ')
+    algorithm = algorithm.lower()
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError(f"Unsupported checksum algorithm '{algorithm}'.")
+    try:
+        return algorithm, base64.b64decode(digest, validate=True)
+    except ValueError:
+        raise ValueError("Malformed checksum digest.")
+
+
+def write_chunk(session, stream, length, checksum=None):
+    """
+    Appends one chunk from `stream` to the partial file of an upload session.
+
+    The body is copied in READ_BLOCK_SIZE blocks straight to disk while the
+    checksum is computed on the fly. If the connection drops mid-chunk, the
+    bytes received so far are kept so the client can resume from there. With
+    a checksum the chunk is all-or-nothing: on a mismatch (including a short
+    body) the partial file is truncated back to the previous offset.
+    Returns the new offset.
+    """
+    digest = CHECKSUM_ALGORITHMS[checksum[0]]() if checksum else None
+    written = 0
+
+    os.makedirs(os.path.dirname(session.part_path), exist_ok=True)
+    with open(session.part_path, 'ab') as f:
+        # Drop bytes beyond the committed offset, e.g. from an interrupted request.
+        f.truncate(session.offset)
+        try:
+            while written < length:
+                try:
+                    data = stream.read(min(READ_BLOCK_SIZE, length - written))
+                except OSError:
+                    break
+                if not data:
+                    break
+                f.write(data)
+                if digest is not None:
+                    digest.update(data)
+                written += len(data)
+
+            if digest is not None and digest.digest() != checksum[1]:
+                raise ChecksumMismatch("Chunk checksum does not match.")
+        except BaseException:
+            f.truncate(session.offset)
+            raise
+
+        f.flush()
+        os.fsync(f.fileno())
+
+    return session.offset + written
+
+
+def complete_upload(session):
+    """
+    Moves a fully received upload into the video directory and creates its Video.
+
+    Creating the Video fires `video_post_save`, which enqueues the ingest and
+    transcode jobs once the transaction has committed.
+    """
+    name = _reserve_name(f'videos/{get_valid_filename(session.filename)}')
+    os.replace(session.part_path, default_storage.path(name))
+
+    with transaction.atomic():
+        video = Video.objects.create(
+            title=session.title,
+            description=session.description,
+            category=session.category,
+            video_file=name,
+        )
+        UploadSession.objects.filter(pk=session.pk).update(state=UploadSession.STATE_COMPLETED, video=video)
+
+    return video
+
+
+def abort_upload(session):
+    """
+    Marks an upload session as aborted and removes its partial file.
+    """
+    UploadSession.objects.filter(pk=session.pk).update(state=UploadSession.STATE_ABORTED)
+    try:
+        os.remove(session.part_path)
+    except FileNotFoundError:
+        pass
+
+
+def _reserve_name(name):
+    """
+    Internal helper claiming a free storage name for a finished upload.
+
+    The name is reserved by creating an empty file exclusively, so a
+    concurrent request choosing the same name cannot be overwritten by the
+    following `os.replace`; on a collision another name is picked.
+    """
+    while True:
+        name = default_storage.get_available_name(name)
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+        except FileExistsError:
+            continue
+        return name